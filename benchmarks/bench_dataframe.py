@@ -0,0 +1,68 @@
+"""
+Micro-benchmark for the per-frame overhead of MSPDataFrame and Topic.
+
+Usage:
+    python benchmarks/bench_dataframe.py [-n NUMBER]
+
+Prints the mean time per operation (in nanoseconds) for operations that are performed for every frame that passes
+a module, and the memory footprint of a single frame.
+"""
+from argparse import ArgumentParser
+from typing import Tuple
+import sys
+import timeit
+import tracemalloc
+
+from multisensor_pipeline.dataframe import MSPDataFrame, Topic, topic_registry
+from multisensor_pipeline.modules.base.profiling import MSPModuleStats
+
+
+def _frame_size(n: int = 10000) -> float:
+    """ Returns the mean number of bytes allocated per frame (excluding the payload). """
+    topic = Topic(name="gaze", dtype=Tuple[float, float])
+    data = (.5, .5)
+    tracemalloc.start()
+    frames = [MSPDataFrame(topic=topic, data=data, timestamp=0.) for _ in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del frames
+    return size / n
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=200000, help="number of repetitions per operation")
+    args = parser.parse_args()
+
+    topic = Topic(name="gaze", dtype=Tuple[float, float])
+    sink_topic = Topic(dtype=Tuple[float, float])
+    frame = MSPDataFrame(topic=topic, data=(.5, .5))
+    stats = MSPModuleStats()
+    routes = {sink_topic: [], Topic(name="imu", dtype=float): [], Topic(): []}
+
+    def _dispatch():
+        for t, _ in routes.items():
+            if frame.topic.is_control_topic or frame.topic == t:
+                pass
+
+    benchmarks = {
+        "MSPDataFrame()": lambda: MSPDataFrame(topic=topic, data=(.5, .5)),
+        "frame.topic / frame.data": lambda: (frame.topic, frame.data),
+        "Topic.uuid": lambda: topic.uuid,
+        "hash(Topic)": lambda: hash(topic),
+        "Topic == Topic": lambda: topic == sink_topic,
+        "topic_registry.matches": lambda: topic_registry.matches(topic.id, sink_topic.id),
+        "Topic.is_control_topic": lambda: topic.is_control_topic,
+        "dispatch (3 routes)": _dispatch,
+        "MSPModuleStats.add_frame": lambda: stats.add_frame(frame, MSPModuleStats.Direction.IN),
+    }
+
+    print(f"python {sys.version.split()[0]}, n={args.number}")
+    for name, func in benchmarks.items():
+        t = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number
+        print(f"{name:<28}{t * 1e9:>10.1f} ns")
+    print(f"{'memory per frame':<28}{_frame_size():>10.1f} B")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,4 @@
 from .dataframe import Topic, MSPDataFrame, MSPControlMessage
+from .codecs import ImageEncoder, ImageCodec, JpegImageCodec, PngImageCodec, RawImageCodec, PassthroughImageCodec, \
+    register_image_codec, get_image_codec
+from .registry import TopicRegistry, topic_registry
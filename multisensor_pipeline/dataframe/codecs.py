@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Union
+import io
+import logging
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# key in Image.info where decoded images keep the bytes they were decoded from (used for pass-through encoding)
+ENCODED_BYTES_KEY = "msp.encoded_bytes"
+
+
+class ImageEncoder(ABC):
+    """
+    Base class for encoders of Image.Image payloads for msgpack serialization. Encoders that produce a format of their
+    own must implement ImageCodec, such that the images can be decoded.
+    """
+
+    name = None
+
+    @abstractmethod
+    def encode(self, image: Image.Image) -> dict:
+        """ Returns a msgpack-serializable dict representing the image. """
+        raise NotImplementedError()
+
+    @property
+    def key(self) -> tuple:
+        """ Identifies the encoder and its settings, i.e., encoders with the same key produce the same bytes. """
+        return self.name,
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.key[1:]}"
+
+
+class ImageCodec(ImageEncoder, ABC):
+    """
+    Base class for codecs that encode and decode Image.Image payloads for msgpack serialization.
+    """
+
+    @staticmethod
+    @abstractmethod
+    def can_decode(obj: dict) -> bool:
+        """ Returns whether the given dict was encoded by this codec. """
+        raise NotImplementedError()
+
+    @staticmethod
+    @abstractmethod
+    def decode(obj: dict) -> Image.Image:
+        raise NotImplementedError()
+
+
+class _CompressedImageCodec(ImageCodec, ABC):
+    """ Encodes images using one of the file formats supported by Pillow. """
+
+    format = None
+    marker = None
+
+    def _save_kwargs(self) -> dict:
+        return {}
+
+    def encode(self, image: Image.Image) -> dict:
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.format, **self._save_kwargs())
+        return self.encode_bytes(buffer.getvalue())
+
+    @classmethod
+    def encode_bytes(cls, data: bytes) -> dict:
+        return {
+            cls.marker: True,
+            "bytes": data
+        }
+
+    @classmethod
+    def can_decode(cls, obj: dict) -> bool:
+        return cls.marker in obj
+
+    @staticmethod
+    def decode(obj: dict) -> Image.Image:
+        image = Image.open(io.BytesIO(obj["bytes"]))
+        # keep the encoded bytes for re-sending the image without re-encoding it
+        image.info[ENCODED_BYTES_KEY] = obj["bytes"]
+        return image
+
+
+class JpegImageCodec(_CompressedImageCodec):
+    """ Lossy JPEG compression. This is the default codec. """
+
+    name = "jpeg"
+    format = "JPEG"
+    marker = "__jpeg__"
+
+    def __init__(self, quality: int = 90):
+        """
+        Args:
+            quality: JPEG quality between 1 (worst) and 95 (best)
+        """
+        self._quality = quality
+
+    @property
+    def quality(self) -> int:
+        return self._quality
+
+    @property
+    def key(self) -> tuple:
+        return self.name, self._quality
+
+    def _save_kwargs(self) -> dict:
+        return {"quality": self._quality}
+
+
+class PngImageCodec(_CompressedImageCodec):
+    """ Lossless PNG compression. """
+
+    name = "png"
+    format = "PNG"
+    marker = "__png__"
+
+    def __init__(self, compress_level: int = 1):
+        """
+        Args:
+            compress_level: zlib compression level between 0 (fast) and 9 (small)
+        """
+        self._compress_level = compress_level
+
+    @property
+    def key(self) -> tuple:
+        return self.name, self._compress_level
+
+    def _save_kwargs(self) -> dict:
+        return {"compress_level": self._compress_level}
+
+
+class RawImageCodec(ImageCodec):
+    """ Sends the uncompressed pixel buffer. This costs no CPU time, but needs the most bandwidth. """
+
+    name = "raw"
+    marker = "__rawimage__"
+
+    def encode(self, image: Image.Image) -> dict:
+        return {
+            self.marker: True,
+            "mode": image.mode,
+            "size": image.size,
+            "bytes": image.tobytes()
+        }
+
+    @classmethod
+    def can_decode(cls, obj: dict) -> bool:
+        return cls.marker in obj
+
+    @staticmethod
+    def decode(obj: dict) -> Image.Image:
+        return Image.frombytes(mode=obj["mode"], size=tuple(obj["size"]), data=obj["bytes"])
+
+
+class PassthroughImageCodec(ImageEncoder):
+    """
+    Re-uses the encoded bytes of images that were decoded from a JPEG or PNG stream, e.g., images received by a
+    ZmqSubscriber or replayed by a DefaultReplaySource. All other images are encoded using the fallback codec.
+    Images must not be modified in place after decoding, otherwise outdated bytes are sent. The pass-through images are
+    decoded by the respective codec.
+    """
+
+    name = "passthrough"
+
+    def __init__(self, fallback: Union[str, ImageEncoder] = "jpeg"):
+        """
+        Args:
+            fallback: codec for images that do not provide encoded bytes
+        """
+        self._fallback = get_image_codec(fallback)
+        self._codecs_by_format = {c.format: c for c in [JpegImageCodec, PngImageCodec]}
+
+    @property
+    def fallback(self) -> ImageEncoder:
+        return self._fallback
+
+    @property
+    def key(self) -> tuple:
+        return (self.name,) + self._fallback.key
+
+    def encode(self, image: Image.Image) -> dict:
+        # images that were created from other images (e.g., crops) have no format
+        codec = self._codecs_by_format.get(image.format)
+        data = image.info.get(ENCODED_BYTES_KEY)
+        if codec is not None and data is not None:
+            return codec.encode_bytes(data)
+        return self._fallback.encode(image)
+
+
+_image_codecs: Dict[str, type] = {}  # name -> encoder or codec class
+_image_decoders: Dict[str, type] = {}  # name -> codec class
+
+
+def register_image_codec(codec_cls: type):
+    """
+    Registers an encoder or codec class, such that it can be selected by its name. Images encoded by a codec
+    (ImageCodec) can be deserialized.
+    """
+    assert issubclass(codec_cls, ImageEncoder), "Image codecs must inherit from ImageEncoder or ImageCodec"
+    assert codec_cls.name is not None, "Image codecs must define a name"
+    _image_codecs[codec_cls.name] = codec_cls
+    if issubclass(codec_cls, ImageCodec):
+        _image_decoders[codec_cls.name] = codec_cls
+    else:
+        _image_decoders.pop(codec_cls.name, None)
+
+
+def get_image_codec(codec: Optional[Union[str, ImageEncoder]] = None) -> ImageEncoder:
+    """
+    Returns an image codec instance.
+    Args:
+        codec: a codec instance, the name of a registered codec (using default settings), or None for the default codec
+    """
+    if codec is None:
+        return DEFAULT_IMAGE_CODEC
+    if isinstance(codec, ImageEncoder):
+        return codec
+    assert codec in _image_codecs, f"Unknown image codec '{codec}', available: {list(_image_codecs.keys())}"
+    return _image_codecs[codec]()
+
+
+def decode_image(obj: dict) -> Optional[Image.Image]:
+    """ Decodes an image that was encoded by a registered codec, returns None if no codec matches. """
+    for codec_cls in _image_decoders.values():
+        if codec_cls.can_decode(obj):
+            return codec_cls.decode(obj)
+    return None
+
+
+for _codec_cls in [JpegImageCodec, PngImageCodec, RawImageCodec, PassthroughImageCodec]:
+    register_image_codec(_codec_cls)
+
+DEFAULT_IMAGE_CODEC = JpegImageCodec(quality=90)
@@ -1,11 +1,12 @@
-from typing import Optional, TypeVar, Generic, Any
+from typing import Optional, TypeVar, Generic, Any, Union
 import logging
-import io
 import time
 import msgpack
 import numpy as np
 
 from PIL import Image
+from .codecs import ImageEncoder, get_image_codec, decode_image
+from .registry import topic_registry
 
 logger = logging.getLogger(__name__)
 T = TypeVar('T')
@@ -13,6 +14,8 @@ T = TypeVar('T')
 
 class Topic:
 
+    __slots__ = ("_name", "_dtype", "_uuid", "_hash", "_is_control_topic", "_id")
+
     def __init__(self, dtype: type = Any, name: Optional[str] = None,):
         """
         :param name:
@@ -22,6 +25,11 @@ class Topic:
         self._dtype = dtype
         if self.name is not None and dtype == Any:
             logger.warning("If dtype is Any, topic.name has no effect.")
+        # topics are immutable -> identity is computed once, because it is used several times per frame
+        self._uuid = f"{self._name}:{self._dtype}"
+        self._hash = hash(self._uuid)
+        self._is_control_topic = self._dtype is MSPControlMessage.ControlTopic.ControlType
+        self._id = topic_registry.intern(self)
 
     @property
     def name(self) -> str:
@@ -33,36 +41,34 @@ class Topic:
 
     @property
     def uuid(self):
-        return f"{self.name}:{self.dtype if self.dtype is not None else None}"
+        return self._uuid
+
+    @property
+    def id(self) -> int:
+        """ Process-wide integer id of the topic (see TopicRegistry), it must not be shared with other processes. """
+        return self._id
 
     @property
     def is_control_topic(self):
-        return self.dtype == MSPControlMessage.ControlTopic.ControlType
+        return self._is_control_topic
 
     def __hash__(self):
-        return hash(self.uuid)
+        return self._hash
+
+    def __reduce__(self):
+        # the hash must be recomputed in other processes (string hashes are randomized per process)
+        return self.__class__, (self._dtype, self._name)
 
     def __eq__(self, sink_topic):
         """
+        Checks whether frames of this topic can be consumed by a sink accepting the sink_topic (see topics_match).
         Args:
             sink_topic: Sink
-            TODO:
         Returns:
         """
         if not isinstance(sink_topic, Topic):
             return False    #TODO: can we replace isinstance?
-
-        if self.dtype is Any or sink_topic.dtype is Any:
-            return True
-
-        dtype_matches = sink_topic.dtype == self.dtype
-
-        if sink_topic.name is not None:
-            name_matches = sink_topic.name == self.name
-        else:
-            name_matches = True
-
-        return dtype_matches and name_matches
+        return topic_registry.matches(self._id, sink_topic._id)
 
     def __str__(self):
         return f"{self.dtype if self.dtype is not None else None}:{self.name}"
@@ -73,6 +79,8 @@ class Topic:
 
 class MSPDataFrame(Generic[T]):
 
+    __slots__ = ("_timestamp", "_duration", "_topic", "_data", "_source_uuid", "_serialized")
+
     def __init__(self, topic: Topic, timestamp: float = None, duration: float = 0, data: Optional[T] = None):
         super(MSPDataFrame, self).__init__()
         self._timestamp = time.perf_counter() if timestamp is None else timestamp
@@ -80,6 +88,7 @@ class MSPDataFrame(Generic[T]):
         self._topic = topic
         self._data = data
         self._source_uuid = None
+        self._serialized = None  # serialization cache: image codec key -> bytes
 
     @property
     def timestamp(self) -> float:
@@ -88,6 +97,7 @@ class MSPDataFrame(Generic[T]):
     @timestamp.setter
     def timestamp(self, timestamp: float):
         self._timestamp = timestamp
+        self._serialized = None
 
     @property
     def topic(self) -> Topic:
@@ -96,6 +106,7 @@ class MSPDataFrame(Generic[T]):
     @topic.setter
     def topic(self, topic: Topic):
         self._topic = topic
+        self._serialized = None
 
     @property
     def source_uuid(self) -> str:
@@ -112,6 +123,7 @@ class MSPDataFrame(Generic[T]):
     @data.setter
     def data(self, data: T):
         self._data = data
+        self._serialized = None
 
     @property
     def duration(self) -> float:
@@ -120,9 +132,25 @@ class MSPDataFrame(Generic[T]):
     @duration.setter
     def duration(self, duration: float):
         self._duration = duration
+        self._serialized = None
+
+    def __getstate__(self):
+        # the serialization cache is neither copied nor pickled, e.g., for sending frames to other processes
+        return {
+            "_timestamp": self._timestamp,
+            "_duration": self._duration,
+            "_topic": self._topic,
+            "_data": self._data,
+            "_source_uuid": self._source_uuid
+        }
+
+    def __setstate__(self, state: dict):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        self._serialized = None
 
     @staticmethod
-    def msgpack_encode(obj):
+    def msgpack_encode(obj, image_codec: Optional[ImageEncoder] = None):
         if isinstance(obj, MSPDataFrame):
             return {
                 "__dataframe__": True,
@@ -139,26 +167,48 @@ class MSPDataFrame(Generic[T]):
             }
         if isinstance(obj, np.integer):
             return int(obj)
-        if isinstance(obj, np.float):
+        if isinstance(obj, np.floating):
             return float(obj)
         if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject:
+                # object arrays have no raw buffer representation -> fall back to nested lists
+                return {
+                    "__ndarray__": True,
+                    "data": obj.tolist(),
+                    "shape": obj.shape,
+                    "dtype": obj.dtype.name
+                }
+            # dtype.str includes the byte order, e.g., '<f4' or '>i2', structured dtypes are encoded by their fields
             return {
                 "__ndarray__": True,
-                "data": obj.tolist(),
+                "bytes": np.ascontiguousarray(obj).data,
                 "shape": obj.shape,
-                "dtype": obj.dtype.name
+                "dtype": obj.dtype.str if obj.dtype.fields is None else obj.dtype.descr
             }
         if isinstance(obj, Image.Image):
-            buffer = io.BytesIO()
-            obj.save(buffer, format="jpeg", quality=90)
-            return {
-                "__jpeg__": True,
-                "bytes": buffer.getvalue()
-            }
+            return get_image_codec(image_codec).encode(obj)
         return obj
 
-    def serialize(self) -> bytes:
-        return msgpack.packb(self, default=MSPDataFrame.msgpack_encode)
+    def serialize(self, image_codec: Optional[Union[str, ImageEncoder]] = None) -> bytes:
+        """
+        Serializes the dataframe using msgpack. The result is cached per image codec setting, such that frames are
+        serialized only once if they are consumed by several serializing sinks (e.g., recording and network).
+        The cache is reset when data, topic, timestamp or duration are reassigned. Note that in-place changes of the
+        payload are not detected.
+        Args:
+            image_codec: codec (or name of a registered codec) for Image.Image payloads, JPEG is used by default
+        """
+        image_codec = get_image_codec(image_codec)
+        cache = self._serialized
+        if cache is not None and image_codec.key in cache:
+            return cache[image_codec.key]
+
+        packed = msgpack.packb(self, default=lambda obj: MSPDataFrame.msgpack_encode(obj, image_codec=image_codec))
+        if cache is None:
+            cache = {}
+            self._serialized = cache
+        cache[image_codec.key] = packed
+        return packed
 
     @staticmethod
     def deserialize(frame: bytes):
@@ -176,15 +226,39 @@ class MSPDataFrame(Generic[T]):
         elif '__topic__' in obj:
             obj = Topic(name=obj["name"], dtype=obj["dtype"])
         elif '__ndarray__' in obj:
-            obj = np.array(
-                object=obj["data"],
-                # shape=obj["shape"],
-                dtype=obj["dtype"]
-            )
-        elif '__jpeg__' in obj:
-            obj = Image.open(io.BytesIO(obj["bytes"]))
+            obj = MSPDataFrame._decode_ndarray(obj)
+        else:
+            image = decode_image(obj)
+            if image is not None:
+                obj = image
         return obj
 
+    @staticmethod
+    def _decode_ndarray(obj) -> np.ndarray:
+        """
+        Decodes an ndarray. Arrays that were encoded as raw buffer are not copied, i.e., they are read-only views on
+        the received bytes. Recordings that contain list-encoded arrays (up to v2.1.1) are supported as well.
+        """
+        if "bytes" in obj:
+            dtype = obj["dtype"]
+            if isinstance(dtype, list):
+                dtype = MSPDataFrame._decode_dtype_descr(dtype)
+            array = np.frombuffer(obj["bytes"], dtype=np.dtype(dtype))
+        else:
+            array = np.array(object=obj["data"], dtype=obj["dtype"])
+        return array.reshape(obj["shape"])
+
+    @staticmethod
+    def _decode_dtype_descr(descr: list) -> list:
+        """ Restores the field tuples of a structured dtype description (msgpack returns them as lists). """
+        fields = []
+        for field in descr:
+            name, fmt = field[0], field[1]
+            if isinstance(fmt, list):  # nested structured dtype
+                fmt = MSPDataFrame._decode_dtype_descr(fmt)
+            fields.append((name, fmt) if len(field) == 2 else (name, fmt, tuple(field[2])))
+        return fields
+
     @staticmethod
     def get_msgpack_unpacker(filehandle) -> msgpack.Unpacker:
         return msgpack.Unpacker(file_like=filehandle, object_hook=MSPDataFrame.msgpack_decode, raw=False)
@@ -192,11 +266,20 @@ class MSPDataFrame(Generic[T]):
 
 class MSPControlMessage(MSPDataFrame):
 
+    __slots__ = ()
+
     class ControlTopic(Topic):
+
+        __slots__ = ()
+
         class ControlType:
             pass
-        name = None
-        dtype = ControlType
+
+        def __init__(self):
+            super(MSPControlMessage.ControlTopic, self).__init__(dtype=self.ControlType)
+
+        def __reduce__(self):
+            return self.__class__, ()
 
     END_OF_STREAM = "EOS"
     PASS = "PASS"
@@ -0,0 +1,82 @@
+from threading import Lock
+from typing import Any
+
+
+def topics_match(producer_topic, consumer_topic) -> bool:
+    """
+    Returns whether frames of the producer topic can be consumed by a module that accepts the consumer topic:
+    the Any-dtype matches everything, otherwise dtypes must be equal and names must be equal, if the consumer
+    topic defines a name.
+    """
+    if producer_topic.dtype is Any or consumer_topic.dtype is Any:
+        return True
+
+    if consumer_topic.dtype != producer_topic.dtype:
+        return False
+
+    if consumer_topic.name is not None:
+        return consumer_topic.name == producer_topic.name
+    return True
+
+
+class TopicRegistry:
+    """
+    Process-wide registry that interns each distinct topic to a small integer id, such that topics can be looked up
+    and compared by integer. Whether a producer topic matches a consumer topic is computed once per pair of ids, when
+    it is first asked for (e.g., when a route is built), and cached.
+
+    Topics are never removed, the registry holds one entry per distinct (name, dtype) of the process. Topic names
+    should therefore be static, e.g., not derived from the data of frames. Interning a topic takes constant time, the
+    match cache grows with the pairs of topics that are actually compared.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._ids = {}
+        self._topics = []
+        self._matches = {}  # (producer topic id, consumer topic id) -> whether the topics match
+
+    @staticmethod
+    def _key(topic):
+        key = topic.name, topic.dtype
+        try:
+            hash(key)
+        except TypeError:  # unhashable dtype
+            return topic.uuid
+        return key
+
+    def intern(self, topic) -> int:
+        """ Returns the id of the given topic, registers the topic if it is not known yet. """
+        key = self._key(topic)
+        topic_id = self._ids.get(key)
+        if topic_id is not None:
+            return topic_id
+
+        with self._lock:
+            topic_id = self._ids.get(key)
+            if topic_id is not None:
+                return topic_id
+
+            topic_id = len(self._topics)
+            self._topics.append(topic)
+            # publish the id last, lookups without lock must not see incomplete entries
+            self._ids[key] = topic_id
+            return topic_id
+
+    def matches(self, producer_id: int, consumer_id: int) -> bool:
+        """ Returns whether frames of the producer topic can be consumed by a module accepting the consumer topic. """
+        key = producer_id, consumer_id
+        match = self._matches.get(key)
+        if match is None:
+            match = topics_match(self._topics[producer_id], self._topics[consumer_id])
+            self._matches[key] = match
+        return match
+
+    def get_topic(self, topic_id: int):
+        return self._topics[topic_id]
+
+    def __len__(self):
+        return len(self._topics)
+
+
+topic_registry = TopicRegistry()
@@ -6,11 +6,14 @@ from ..dataframe import MSPDataFrame
 
 
 class PassthroughProcessor(BaseProcessor):
+    stateless = True
+
     def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
         return frame
 
 
 class SleepPassthroughProcessor(BaseProcessor):
+    stateless = True
 
     def __init__(self, sleep_time, **kwargs):
         super().__init__(**kwargs)
@@ -14,7 +14,7 @@ class AudioFileSink(BaseSink):
     """
     AudioFileSink writes audio files. It supports formats that are supported by libsndfile.
     """
-    def __init__(self, filename: str, channels: int = 2, samplerate: float = 44100., mode="w"):
+    def __init__(self, filename: str, channels: int = 2, samplerate: float = 44100., mode="w", **kwargs):
         """
         Initialize the WaveFile Sink
         Args:
@@ -22,14 +22,18 @@ class AudioFileSink(BaseSink):
            channels: Number of channels of the file
            samplerate: The audio sampling rate
            mode: w for overriding existing files,
+           kwargs: queue and batching options of BaseSink, e.g., batch_size
         """
-        super(AudioFileSink, self).__init__()
+        super(AudioFileSink, self).__init__(**kwargs)
         self._frames = []
         self._wf = sf.SoundFile(filename, mode=mode, samplerate=int(samplerate), channels=channels)
 
     def on_update(self, frame: MSPDataFrame):
         self._wf.write(frame.data)
 
+    def on_update_batch(self, frames: List[MSPDataFrame]):
+        self._wf.write(np.concatenate([frame.data for frame in frames]))
+
     def on_stop(self):
         """
         Stops the AudioFileSink and closes the filestream
@@ -1,16 +1,22 @@
-from multisensor_pipeline.modules.base import BaseSource
+from multisensor_pipeline.modules.base import BaseCallbackSource
 from multisensor_pipeline.dataframe import MSPDataFrame, Topic
-from typing import Optional, List
+from collections import deque
+from typing import Optional, List, Union
 import sounddevice as sd
 import numpy as np
 import logging
+import weakref
 
 logger = logging.getLogger(__name__)
 
 
-class MicrophoneSource(BaseSource):
+class MicrophoneSource(BaseCallbackSource):
     """
-    Microphone Source for live audio recording of a connected microphone
+    Microphone Source for live audio recording of a connected microphone. By default, blocks are read from the stream
+    by the source's worker. In callback mode, the audio callback writes the blocks into a preallocated ring buffer and
+    hands them over to the worker, such that the device does not overflow if the worker is delayed. A slot of the ring
+    buffer is reused when all views on it were garbage collected, blocks that arrive while all slots are in use (e.g.,
+    because a sink keeps the frames) are copied.
     """
 
     class InputDevice:
@@ -45,7 +51,10 @@ class MicrophoneSource(BaseSource):
     def __init__(self, device: Optional[InputDevice] = None,
                  channels: Optional[int] = None,
                  samplerate: Optional[float] = None,
-                 blocksize: Optional[int] = 1024):
+                 blocksize: Optional[int] = 1024,
+                 latency: Optional[Union[float, str]] = None,
+                 callback: bool = False,
+                 buffer_blocks: int = 32):
         """
         Initialize the Source
         Args:
@@ -53,8 +62,14 @@ class MicrophoneSource(BaseSource):
            channels: Number of channels of the device
            samplerate: The audio sampling rate
            blocksize: Size of the chunks of the recordings
+           latency: Latency of the stream in seconds or 'low'/'high' (see sounddevice.InputStream), None uses the
+                    default of the device
+           callback: If True, blocks are captured in the audio callback. The frames contain read-only views into the
+                     ring buffer (or read-only copies if all slots are in use)
+           buffer_blocks: Number of blocks in the ring buffer and max number of blocks that wait for the worker
+                          (callback mode only)
         """
-        super(MicrophoneSource, self).__init__()
+        super(MicrophoneSource, self).__init__(capacity=buffer_blocks)
 
         if device is None:
             device = MicrophoneSource.InputDevice(sd.query_devices(kind='input'))
@@ -62,23 +77,64 @@ class MicrophoneSource(BaseSource):
         self._samplerate = self._device.default_samplerate if samplerate is None else samplerate
         self._channels = self._device.channels if channels is None else channels
         self._blocksize = blocksize
+        self._callback_mode = callback
+        self._ring_buffer = None
+        self._free_slots = deque()  # appended by finalizers of any thread, taken by the audio thread
+        if callback:
+            assert blocksize, "callback mode requires a fixed blocksize"
+            assert buffer_blocks >= 2, f"buffer_blocks must be at least 2, but was {buffer_blocks}"
+            self._ring_buffer = np.zeros((buffer_blocks, self._blocksize, self._channels), dtype=np.float32)
+            self._free_slots.extend(range(buffer_blocks))
         self._stream = sd.InputStream(
             samplerate=self._samplerate,
             blocksize=self._blocksize,
             device=self._device.name,
-            channels=self._channels
+            channels=self._channels,
+            dtype=np.float32,
+            latency=latency,
+            callback=self._on_audio_block if callback else None
         )
 
     def on_start(self):
         self._stream.start()
 
+    def _on_audio_block(self, indata: np.ndarray, frames: int, time_info, status: sd.CallbackFlags):
+        """
+        Copies a block into the next slot of the ring buffer (called by the audio thread in callback mode)
+        """
+        if status.input_overflow:
+            self._stats.add_overflows()
+        if self._handoff.full():
+            # the worker fell behind by a whole ring buffer
+            self._stats.add_overflows()
+            return
+
+        try:
+            slot = self._free_slots.popleft()
+        except IndexError:
+            data = indata.copy()
+        else:
+            self._ring_buffer[slot, :frames] = indata
+            # slices of the ring buffer would reference the ring buffer itself, arrays derived from a buffer view
+            # reference the view, i.e., the slot is released when all of them were garbage collected
+            view = np.frombuffer(memoryview(self._ring_buffer[slot]), dtype=np.float32)
+            weakref.finalize(view, self._free_slots.append, slot)
+            data = view.reshape((self._blocksize, self._channels))[:frames]
+        data.flags.writeable = False
+        self.put_frame(MSPDataFrame(topic=self.output_topics[0], data=data, timestamp=time_info.inputBufferAdcTime))
+
     def on_update(self) -> Optional[MSPDataFrame]:
         """
         Sends chunks of the audio recording
         """
+        if self._callback_mode:
+            return super(MicrophoneSource, self).on_update()
+
         t = self._stream.time
-        data, _ = self._stream.read(self._blocksize)
-        return MSPDataFrame(topic=self.output_topics[0], data=data.copy(), timestamp=t)
+        data, overflowed = self._stream.read(self._blocksize)
+        if overflowed:
+            self._stats.add_overflows()
+        return MSPDataFrame(topic=self.output_topics[0], data=data, timestamp=t)
 
     def on_stop(self):
         """
@@ -98,6 +154,11 @@ class MicrophoneSource(BaseSource):
     def samplerate(self) -> float:
         return self._samplerate
 
+    @property
+    def latency(self) -> float:
+        """ Returns the actual input latency of the stream in seconds. """
+        return self._stream.latency
+
     @property
     def output_topics(self) -> Optional[List[Topic]]:
         return [Topic(name="audio", dtype=np.ndarray)]
@@ -1,2 +1,6 @@
 from .base import BaseModule, BaseSource, BaseProcessor, BaseSink
+from .callback import BaseCallbackSource
+from .timer import TimerService, OverrunPolicy, get_timer_service, wait_until
 from .profiling import MSPModuleStats
+from .queues import FrameQueue, OverflowPolicy
+from .transport import SharedMemoryQueue, Transport
@@ -1,12 +1,15 @@
 from abc import ABC, abstractmethod
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 from multisensor_pipeline.dataframe.dataframe import MSPDataFrame, Topic
 from multisensor_pipeline.dataframe import MSPControlMessage
+from multisensor_pipeline.dataframe.registry import topic_registry
 from multisensor_pipeline.modules.base.profiling import MSPModuleStats
-from multiprocessing.queues import Queue as MPQueue
-from typing import Union, Optional, List
+from multisensor_pipeline.modules.base.queues import FrameQueue, OverflowPolicy
+from typing import Union, Optional, List, Dict
 import logging
+import time
 import uuid
 from collections import defaultdict
 
@@ -29,15 +32,21 @@ class BaseModule(object):
         self._profiling = profiling
         self._stats = MSPModuleStats()
         self._active = False
+        self._threaded = True
 
-    def start(self):
+    def start(self, threaded: bool = True):
         """
         Starts the module.
+        Args:
+           threaded: If True, the worker runs in the module's own thread. Otherwise, the module is only activated and
+                     must be driven by a pipeline runtime.
         """
         logger.debug("starting: {}".format(self.uuid))
         self._active = True
+        self._threaded = threaded
         self.on_start()
-        self._thread.start()
+        if threaded:
+            self._thread.start()
 
     def on_start(self):
         """ Custom initialization """
@@ -57,7 +66,7 @@ class BaseModule(object):
         """ Stops the module. """
         logger.debug("stopping: {}".format(self.uuid))
         self._active = False
-        if blocking:
+        if blocking and self._threaded:
             self._thread.join()
         self.on_stop()
 
@@ -66,7 +75,9 @@ class BaseModule(object):
         pass
 
     def join(self):
-        self._thread.join()
+        """ Waits for the worker thread, modules that are driven by a pipeline runtime are joined by the pipeline. """
+        if self._threaded:
+            self._thread.join()
 
     @property
     def active(self):
@@ -110,11 +121,16 @@ class BaseSource(BaseModule, ABC):
         """
         super().__init__()
         self._sinks = defaultdict(list)
+        self._routes = {}  # emitted topic id -> deduplicated list of observers
 
     def _worker(self):
         """ Source worker function: notify observer when source update function returns a DataFrame """
         while self._active:
-            self._notify(self.on_update())
+            self._step()
+
+    def _step(self):
+        """ Gets the next DataFrame and notifies the observers (used by the worker and by pipeline runtimes) """
+        self._notify(self.on_update())
 
     @abstractmethod
     def on_update(self) -> Optional[MSPDataFrame]:
@@ -127,13 +143,14 @@ class BaseSource(BaseModule, ABC):
 
         Args:
             topics:
-            sink: A thread-safe Queue object or Sink [or any class that implements put(tuple)]
+            sink: A Sink or any thread-safe object that implements put(frame), e.g., a (multiprocessing) Queue
         """
         connected = False
         if isinstance(topics, Topic):
             topics = [topics]
 
-        if isinstance(sink, Queue) or isinstance(sink, MPQueue):
+        if not isinstance(sink, BaseSink):
+            assert callable(getattr(sink, "put", None)), f"{sink} is neither a sink nor implements put(frame)"
             if topics is None:
                 self._sinks[Topic()].append(sink)
                 connected = True
@@ -141,13 +158,13 @@ class BaseSource(BaseModule, ABC):
                 for topic in topics:
                     self._sinks[topic].append(sink)
                     connected = True
+            self._update_routes()
             return
 
-        assert isinstance(sink, BaseSink) or isinstance(sink, BaseProcessor)
         # case 1: if no topic filter is specified
         if topics is None:
             for topic in self.output_topics:
-                if topic in sink.input_topics:
+                if self._is_accepted(topic, sink):
                     self._sinks[topic].append(sink)
                     sink.add_source(self)
                     connected = True
@@ -155,12 +172,42 @@ class BaseSource(BaseModule, ABC):
         else:
             for topic in topics:
                 matches_output = any([t == topic for t in self.output_topics])
-                if matches_output and topic in sink.input_topics:
+                if matches_output and self._is_accepted(topic, sink):
                     self._sinks[topic].append(sink)
                     sink.add_source(self)
                     connected = True
+        self._update_routes()
         assert connected, f"No connection could be established between {self.name}:{sink.name} with topic(s) {topics}"
 
+    @staticmethod
+    def _is_accepted(topic: Topic, sink) -> bool:
+        """ Checks whether frames of the given topic can be consumed by the sink. """
+        return any([topic_registry.matches(topic.id, t.id) for t in sink.input_topics])
+
+    def _update_routes(self):
+        """
+        Rebuilds the routing table from emitted topics to observers. Must be called whenever observers change.
+        Routes for the output topics are built eagerly, routes for other emitted topics on their first occurrence.
+        """
+        self._routes = {}
+        for topic in self.output_topics:
+            self._get_route(topic)
+
+    def _get_route(self, topic: Topic) -> list:
+        """ Returns all observers that receive frames of the given topic (each observer is contained once). """
+        route = self._routes.get(topic.id)
+        if route is None:
+            route = []
+            observer_ids = set()
+            for t, sinks in self._sinks.items():
+                if topic.is_control_topic or topic_registry.matches(topic.id, t.id):
+                    for sink in sinks:
+                        if id(sink) not in observer_ids:
+                            observer_ids.add(id(sink))
+                            route.append(sink)
+            self._routes[topic.id] = route
+        return route
+
     def _notify(self, frame: Optional[MSPDataFrame]):
         """
         Notifies all observers that there's a new dataframe
@@ -174,10 +221,11 @@ class BaseSource(BaseModule, ABC):
         # assert isinstance(frame, MSPDataFrame), "You must use a MSPDataFrame instance to wrap your data."
         frame.source_uuid = self.uuid
 
-        for topic, sinks in self._sinks.items():
-            if frame.topic.is_control_topic or frame.topic == topic:
-                for sink in sinks:
-                    sink.put(frame)
+        route = self._routes.get(frame.topic.id)
+        if route is None:
+            route = self._get_route(frame.topic)
+        for sink in route:
+            sink.put(frame)
 
         if self._profiling:
             self._stats.add_frame(frame, MSPModuleStats.Direction.OUT)
@@ -201,19 +249,52 @@ class BaseSource(BaseModule, ABC):
 class BaseSink(BaseModule, ABC):
     """ Base class for data sinks. """
 
-    def __init__(self, dropout: Union[bool, float] = False):
+    def __init__(self, dropout: Union[bool, float] = False, capacity: int = 0, overflow: str = OverflowPolicy.BLOCK,
+                 topic_queues: Optional[Dict[Topic, dict]] = None, batch_size: int = 1, batch_timeout: float = 0.):
         """
-        Initializes the worker thread and a queue that will receive new samples from sources.
+        Initializes the worker thread and a queue that will receive new samples from sources. Each incoming topic is
+        queued separately, queued frames are handled in timestamp order.
 
         Args:
            dropout: Set the max age before elements of the queue are dropped
+           capacity: Set the max number of queued frames per topic (0 means unbounded)
+           overflow: Set the OverflowPolicy that is applied if the queue is full: block the producer (default),
+                     drop the oldest frame, drop the newest frame, or keep only the latest frame per topic
+           topic_queues: Set dropout, capacity and/or overflow for specific topics, e.g.,
+                         {Topic(name="video", dtype=Image.Image): {"capacity": 1, "overflow": OverflowPolicy.LATEST}}
+           batch_size: Set the max number of frames that are handed over to on_update_batch at once (1 disables
+                       batching)
+           batch_timeout: Set the max time (in seconds) to wait for further frames of a batch
         """
         super().__init__()
-        self._queue = Queue()
+        self._queue = FrameQueue(capacity=capacity, overflow=overflow, dropout=dropout, topic_queues=topic_queues)
+        assert batch_size >= 1, f"batch_size must be at least 1, but was {batch_size}"
+        self._batch_size = batch_size
+        self._batch_timeout = batch_timeout
         self._active_sources = {}
-        self._dropout = dropout  # in seconds
-        if dropout and isinstance(dropout, bool):
-            self._dropout = 5
+        self._fused = False
+
+    @property
+    def fusable(self) -> bool:
+        """ Returns whether the module can be fused, i.e., it neither batches nor drops frames. """
+        return self._batch_size == 1 and self._queue.is_unbounded
+
+    @property
+    def fused(self) -> bool:
+        return self._fused
+
+    def fuse(self):
+        """
+        Fuses the module into its predecessor: incoming frames are handled right away in the thread of the
+        predecessor instead of being queued, and the module does not start a worker thread. Must be called before
+        the module is started and only if all predecessors send from the same thread.
+        """
+        assert self.fusable, f"{self.name} can not be fused, it uses batching, parallelism, capacity or dropout"
+        assert not self.active, f"{self.name} can not be fused after it was started"
+        self._fused = True
+
+    def start(self, threaded: bool = True):
+        super(BaseSink, self).start(threaded=threaded and not self._fused)
 
     def add_source(self, source: BaseModule):
         """
@@ -251,44 +332,88 @@ class BaseSink(BaseModule, ABC):
         """
         Sink worker function: handles the incoming Dataframes
         """
+        if self._batch_size > 1:
+            self._batch_worker()
+            return
+
         while self._active:
-            frame = self._queue.get()
+            self._process_frame(self._queue.get())
+
+    def _process_frame(self, frame: MSPDataFrame):
+        """
+        Handles an incoming control message or Dataframe (used by the worker and by pipeline runtimes)
+        """
+        if self._handle_control_message(frame):
+            return
+
+        if self._profiling:  # TODO: check profiling
+            self._stats.add_frame(frame, MSPModuleStats.Direction.IN)
+            t_start = time.perf_counter()
+            self._handle_frame(frame)
+            self._stats.add_update_time(time.perf_counter() - t_start)
+            return
 
-            if self._handle_control_message(frame):
-                continue
+        self._handle_frame(frame)
 
-            if self._profiling:  # TODO: check profiling
+    def _handle_frame(self, frame: MSPDataFrame):
+        self.on_update(frame)
+
+    def _batch_worker(self):
+        """
+        Worker function for batch processing: hands over up to batch_size incoming Dataframes at once
+        """
+        while self._active:
+            self._process_frame_batch(self._queue.get_batch(self._batch_size, self._batch_timeout))
+
+    def _process_frame_batch(self, frames: List[MSPDataFrame]):
+        """
+        Handles a batch of incoming Dataframes or a single control message (used by the worker and by pipeline
+        runtimes)
+        """
+        # control messages are never batched together with other frames
+        if self._handle_control_message(frames[0]):
+            return
+
+        if self._profiling:
+            for frame in frames:
                 self._stats.add_frame(frame, MSPModuleStats.Direction.IN)
+            t_start = time.perf_counter()
+            self._handle_batch(frames)
+            self._stats.add_update_time(time.perf_counter() - t_start, len(frames))
+            return
 
-            self.on_update(frame)
+        self._handle_batch(frames)
+
+    def _handle_batch(self, frames: List[MSPDataFrame]):
+        self.on_update_batch(frames)
 
     @abstractmethod
     def on_update(self, frame: MSPDataFrame):
         """ Custom update routine. """
         raise NotImplementedError()
 
-    def _perform_sample_dropout(self, frame_time) -> int:
-        # TODO: do this per topic (single queue)
-        if not self._dropout:
-            return 0
-
-        num_skipped = 0
-        with self._queue.mutex:
-            while len(self._queue.queue) > 0:
-                frame_age = frame_time - self._queue.queue[0].timestamp
-                if frame_age > self._dropout:
-                    self._queue.queue.popleft()
-                    num_skipped += 1
-                else:
-                    break
-        return num_skipped
+    def on_update_batch(self, frames: List[MSPDataFrame]):
+        """
+        Custom update routine for batches of frames in timestamp order, it is used if batch_size > 1. Calls on_update
+        for each frame by default.
+        """
+        for frame in frames:
+            self.on_update(frame)
 
     def put(self, frame: MSPDataFrame):
-        # TODO: create a queue per topic and perform explicit sample synchronization
-        skipped_frames = self._perform_sample_dropout(frame.timestamp)
-        self._queue.put(frame)
+        if self._fused:
+            self._process_frame(frame)
+            return
+        skipped_frames, dropped_frames = self._queue.put(frame)
         if self._profiling:
-            self._stats.add_queue_state(qsize=self._queue.qsize(), skipped_frames=skipped_frames)
+            self._stats.add_queue_state(
+                qsize=self._queue.qsize(), skipped_frames=skipped_frames, dropped_frames=dropped_frames
+            )
+
+    def stop(self, blocking: bool = True):
+        """ Stops the module and releases producers that are blocked by a full queue. """
+        self._queue.close()
+        super(BaseSink, self).stop(blocking=blocking)
 
     @property
     def input_topics(self) -> List[Topic]:
@@ -299,23 +424,116 @@ class BaseSink(BaseModule, ABC):
 class BaseProcessor(BaseSink, BaseSource, ABC):
     """ Base class for data processors. """
 
+    # Processors that do not keep state between on_update calls can set stateless = True, such that frames can be
+    # processed in parallel (see parallelism)
+    stateless = False
+
+    def __init__(self, parallelism: int = 1, max_in_flight: int = 0, **kwargs):
+        """
+        Initializes the processor.
+
+        Args:
+           parallelism: Set the number of threads calling on_update (or on_update_batch) concurrently, only stateless
+                        processors support parallelism > 1. Processed frames are sent in input order.
+           max_in_flight: Set the max number of frames (or batches) that are processed or wait to be sent
+                          (default: 2 * parallelism)
+           kwargs: queue and batching options of BaseSink
+        """
+        super(BaseProcessor, self).__init__(**kwargs)
+        assert parallelism >= 1, f"parallelism must be at least 1, but was {parallelism}"
+        assert parallelism == 1 or self.stateless, f"{self.name} is not stateless and does not support parallelism"
+        self._parallelism = parallelism
+        self._max_in_flight = max_in_flight if max_in_flight > 0 else 2 * parallelism
+        self._update_error = None  # exception of an on_update call of the parallel worker
+
+    @property
+    def fusable(self) -> bool:
+        """ Returns whether the processor can be fused, i.e., it neither batches, parallelizes nor drops frames. """
+        return super(BaseProcessor, self).fusable and self._parallelism == 1
+
     def _worker(self):
         """
         Processor worker function: handles the incoming dataframe and sends the new processed frame to the observers
         """
-        while self._active:
-            # get incoming frame
-            frame = self._queue.get()
-            if self._handle_control_message(frame):
-                continue
-            if self._profiling:
-                self._stats.add_frame(frame, MSPModuleStats.Direction.IN)
+        if self._parallelism > 1:
+            self._parallel_worker()
+            return
+        super(BaseProcessor, self)._worker()
 
-            new_frame = self.on_update(frame)
+    def _handle_frame(self, frame: MSPDataFrame):
+        # send processed frame
+        self._notify(self.on_update(frame))
 
-            # send processed frame
+    def _handle_batch(self, frames: List[MSPDataFrame]):
+        for new_frame in self.on_update_batch(frames):
             self._notify(new_frame)
 
+    def _parallel_worker(self):
+        """
+        Worker function for parallel processing: on_update runs on a thread pool, while an emitter thread sends the
+        processed frames in input order. Blocks if max_in_flight frames are pending. If on_update raises an exception,
+        it is raised by the worker (like in the sequential worker), after the frames before were sent.
+        """
+        pending = Queue(maxsize=self._max_in_flight)
+        emitter = Thread(target=self._emit_results, args=(pending,))
+        emitter.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self._parallelism, thread_name_prefix=self.name) as pool:
+                while self._active:
+                    if self._update_error is not None:
+                        raise self._update_error
+                    if self._batch_size > 1:
+                        frames = self._queue.get_batch(self._batch_size, self._batch_timeout)
+                    else:
+                        frames = [self._queue.get()]
+
+                    if frames[0].topic.is_control_topic:
+                        # frames received before the control message are sent first
+                        pending.join()
+                        if self._update_error is not None:
+                            raise self._update_error
+                        self._handle_control_message(frames[0])
+                        continue
+
+                    if self._profiling:
+                        for frame in frames:
+                            self._stats.add_frame(frame, MSPModuleStats.Direction.IN)
+
+                    if self._batch_size > 1:
+                        pending.put((pool.submit(self.on_update_batch, frames), True))
+                    else:
+                        pending.put((pool.submit(self.on_update, frames[0]), False))
+        finally:
+            pending.put(None)
+            emitter.join()
+
+    def _emit_results(self, pending: Queue):
+        """ Sends the results of pending on_update calls in submission order, until a call failed. """
+        while True:
+            item = pending.get()
+            if item is None:
+                pending.task_done()
+                return
+
+            future, batched = item
+            try:
+                if self._update_error is None:
+                    result = future.result()
+                    for new_frame in result if batched else [result]:
+                        self._notify(new_frame)
+            except Exception as e:
+                # the worker raises it, later results are discarded
+                self._update_error = e
+            finally:
+                pending.task_done()
+
     def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
         """ Custom update routine. """
         raise NotImplementedError()
+
+    def on_update_batch(self, frames: List[MSPDataFrame]) -> List[Optional[MSPDataFrame]]:
+        """
+        Custom update routine for batches of frames in timestamp order, it is used if batch_size > 1. Returns the
+        processed frames (None entries are not sent). Calls on_update for each frame by default.
+        """
+        return [self.on_update(frame) for frame in frames]
@@ -0,0 +1,44 @@
+from abc import ABC
+from queue import Queue, Empty, Full
+from typing import Optional
+import logging
+
+from multisensor_pipeline.dataframe import MSPDataFrame
+from multisensor_pipeline.modules.base.base import BaseSource
+
+logger = logging.getLogger(__name__)
+
+
+class BaseCallbackSource(BaseSource, ABC):
+    """
+    Base class for sources whose data is delivered by callbacks of another thread, e.g., of pynput listeners or
+    sounddevice streams. Callbacks hand over their frames with put_frame, the worker waits for them without polling.
+    """
+
+    def __init__(self, timeout: float = .1, capacity: int = 0):
+        """
+        Args:
+            timeout: max time (in seconds) the worker waits for a frame before it checks whether the source stopped
+            capacity: max number of frames that wait for the worker (0 means unbounded), further frames are dropped
+        """
+        super().__init__()
+        self._timeout = timeout
+        self._handoff = Queue(maxsize=capacity)
+
+    def put_frame(self, frame: Optional[MSPDataFrame]):
+        """ Hands over a frame to the worker, can be called from any thread and never blocks. """
+        try:
+            self._handoff.put_nowait(frame)
+        except Full:
+            logger.debug(f"[DROPPED] {self.uuid} can not keep up with its callbacks")
+
+    def on_update(self) -> Optional[MSPDataFrame]:
+        try:
+            return self._handoff.get(timeout=self._timeout)
+        except Empty:
+            return None
+
+    def stop(self, blocking: bool = True):
+        self._active = False
+        self.put_frame(None)  # wake up the worker
+        super(BaseCallbackSource, self).stop(blocking=blocking)
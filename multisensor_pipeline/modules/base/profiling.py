@@ -3,6 +3,8 @@ from typing import Optional
 from multisensor_pipeline.dataframe import MSPDataFrame, MSPControlMessage, Topic
 from datetime import datetime
 from collections import deque
+from threading import Lock
+import copy
 import time
 
 
@@ -109,6 +111,26 @@ class MSPModuleStats:
         self._out_stats = {}
         self._queue_size = self.MovingAverageStats()
         self._skipped_frames = self.RobustSamplerateStats()
+        self._dropped_frames = self.RobustSamplerateStats()
+        self._num_skipped_frames = 0
+        self._num_dropped_frames = 0
+        self._num_overflows = 0
+        self._update_time = self.MovingAverageStats()
+        self._lock = Lock()  # the stats are updated by the worker and copied by other threads (see snapshot)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def snapshot(self) -> "MSPModuleStats":
+        """ Returns a copy of the stats, which is consistent while the worker keeps updating them. """
+        with self._lock:
+            return copy.deepcopy(self)
 
     def get_stats(self, direction: Direction, topic: Optional[Topic] = None):
         if direction == self.Direction.IN:
@@ -130,23 +152,84 @@ class MSPModuleStats:
 
         # per direction, topic -> update stats
         stats = self.get_stats(direction)
-        if frame.topic.uuid not in stats:
-            stats[frame.topic.uuid] = self.RobustSamplerateStats()
-        stats[frame.topic.uuid].update(time_received)
+        with self._lock:
+            if frame.topic.uuid not in stats:
+                stats[frame.topic.uuid] = self.RobustSamplerateStats()
+            stats[frame.topic.uuid].update(time_received)
 
-    def add_queue_state(self, qsize: int, skipped_frames: int):
+    def add_queue_state(self, qsize: int, skipped_frames: int, dropped_frames: int = 0):
+        """
+        Args:
+            qsize: current size of the input queue
+            skipped_frames: number of frames that were skipped, because they were too old (dropout)
+            dropped_frames: number of frames that were dropped, because the queue was full (overflow policy)
+        """
         time_received = time.perf_counter()
-        self._queue_size.update(qsize)
-        for i in range(skipped_frames):
-            self._skipped_frames.update(time_received)
+        with self._lock:
+            self._queue_size.update(qsize)
+            for i in range(skipped_frames):
+                self._skipped_frames.update(time_received)
+            for i in range(dropped_frames):
+                self._dropped_frames.update(time_received)
+            self._num_skipped_frames += skipped_frames
+            self._num_dropped_frames += dropped_frames
+
+    def add_overflows(self, overflows: int = 1):
+        """
+        Args:
+            overflows: number of input overflows of a device source, i.e., blocks of samples that were lost before
+                       they reached the source
+        """
+        with self._lock:
+            self._num_overflows += overflows
+
+    def add_update_time(self, duration: float, frames: int = 1):
+        """
+        Args:
+            duration: time (in seconds) on_update (or on_update_batch) took to handle a frame (or batch), processors
+                      include sending the result
+            frames: number of frames of the batch, the time per frame is recorded
+        """
+        with self._lock:
+            self._update_time.update(duration / frames)
 
     @property
     def frame_skip_rate(self):
         return self._skipped_frames.samplerate
 
+    @property
+    def frame_drop_rate(self):
+        return self._dropped_frames.samplerate
+
+    @property
+    def skipped_frames(self) -> int:
+        """ Total number of frames that were skipped due to dropout. """
+        return self._num_skipped_frames
+
+    @property
+    def dropped_frames(self) -> int:
+        """ Total number of frames that were dropped due to queue overflow. """
+        return self._num_dropped_frames
+
+    @property
+    def overflows(self) -> int:
+        """ Total number of input overflows of a device source. """
+        return self._num_overflows
+
     @property
     def average_queue_size(self):
         return self._queue_size.cma
 
+    @property
+    def average_update_time(self) -> float:
+        """ Average time (in seconds) on_update took per frame. """
+        return self._update_time.cma
+
+    @property
+    def recent_update_time(self) -> float:
+        """ Moving average of the time (in seconds) on_update took per frame. """
+        return self._update_time.sma
+
     def finalize(self):
-        self._stop_time = datetime.now()
+        with self._lock:
+            self._stop_time = datetime.now()
@@ -0,0 +1,366 @@
+from collections import deque
+from itertools import count
+from queue import Empty
+from threading import Lock, Condition
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import heapq
+import time
+
+from multisensor_pipeline.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe.registry import topic_registry
+
+
+class OverflowPolicy:
+    """ Defines how a bounded frame queue handles incoming frames, if it is full. """
+    BLOCK = "block"  # block the producer until a frame was consumed
+    DROP_OLDEST = "drop_oldest"  # remove the oldest queued frame
+    DROP_NEWEST = "drop_newest"  # discard the incoming frame
+    LATEST = "latest"  # conflating mailbox: keep only the latest frame per topic
+
+    ALL = [BLOCK, DROP_OLDEST, DROP_NEWEST, LATEST]
+
+
+class FrameBuffer:
+    """
+    FIFO buffer of data frames with an optional capacity, overflow policy and dropout. Frames are only removed from
+    the head of the buffer. The buffer is not thread-safe, see FrameQueue.
+    """
+
+    SETTINGS = ["capacity", "overflow", "dropout"]
+
+    def __init__(self, capacity: int = 0, overflow: str = OverflowPolicy.BLOCK, dropout: Union[bool, float] = False):
+        """
+        Args:
+            capacity: maximum number of queued frames, 0 means unbounded
+            overflow: the OverflowPolicy applied if the buffer is full
+            dropout: max age (in seconds) of queued frames relative to incoming frames, older frames are dropped
+        """
+        assert overflow in OverflowPolicy.ALL, f"unknown overflow policy '{overflow}', use one of {OverflowPolicy.ALL}"
+        self._capacity = capacity
+        self._overflow = overflow
+        self._dropout = dropout
+        if dropout and isinstance(dropout, bool):
+            self._dropout = 5
+        # in conflating mode, the deque holds slots ([frame]) that can be updated in place
+        self._conflate = overflow == OverflowPolicy.LATEST
+        self._frames = deque()
+        self._slots = {}  # topic id -> queued slot (conflating mode only)
+        self._num_pushed = 0  # number of entries that were appended
+        self._num_removed = 0  # number of entries that were removed (consumed or dropped)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def overflow(self) -> str:
+        return self._overflow
+
+    @property
+    def dropout(self) -> Union[bool, float]:
+        return self._dropout
+
+    @property
+    def num_pushed(self) -> int:
+        return self._num_pushed
+
+    @property
+    def num_removed(self) -> int:
+        return self._num_removed
+
+    def _remove_head(self) -> MSPDataFrame:
+        item = self._frames.popleft()
+        self._num_removed += 1
+        if not self._conflate:
+            return item
+        frame = item[0]
+        if self._slots.get(frame.topic.id) is item:
+            del self._slots[frame.topic.id]
+        return frame
+
+    def drop_expired(self, frame_time: float) -> int:
+        """ Drops all frames at the head of the buffer that are older than frame_time - dropout. """
+        if not self._dropout:
+            return 0
+
+        num_skipped = 0
+        while len(self._frames) > 0 and frame_time - self.peek().timestamp > self._dropout:
+            self._remove_head()
+            num_skipped += 1
+        return num_skipped
+
+    def push(self, frame: MSPDataFrame) -> Optional[Tuple[int, int]]:
+        """
+        Adds a frame to the buffer.
+        Returns:
+            the number of frames skipped due to dropout and dropped due to overflow, or None if the buffer is full and
+            the frame was not added (policy: block)
+        """
+        num_skipped = self.drop_expired(frame.timestamp)
+        num_dropped = 0
+        if self._conflate:
+            slot = self._slots.get(frame.topic.id)
+            if slot is not None:
+                slot[0] = frame
+                return num_skipped, 1
+
+        if self.full:
+            if self._overflow == OverflowPolicy.BLOCK:
+                return None
+            if self._overflow == OverflowPolicy.DROP_NEWEST:
+                return num_skipped, 1
+            self._remove_head()  # drop oldest or latest per topic
+            num_dropped += 1
+
+        if self._conflate:
+            slot = [frame]
+            self._slots[frame.topic.id] = slot
+            self._frames.append(slot)
+        else:
+            self._frames.append(frame)
+        self._num_pushed += 1
+        return num_skipped, num_dropped
+
+    def peek(self) -> MSPDataFrame:
+        item = self._frames[0]
+        return item[0] if self._conflate else item
+
+    def pop(self) -> MSPDataFrame:
+        return self._remove_head()
+
+    @property
+    def full(self) -> bool:
+        return 0 < self._capacity <= len(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class FrameQueue:
+    """
+    Thread-safe input queue of sinks and processors. Each incoming topic is queued in its own FrameBuffer, such that
+    capacity, overflow and dropout apply per topic. Frames are returned in timestamp order, merging the topic buffers
+    using a heap over their head frames. Control messages are returned after all frames that arrived before them.
+    """
+
+    def __init__(self, capacity: int = 0, overflow: str = OverflowPolicy.BLOCK, dropout: Union[bool, float] = False,
+                 topic_queues: Optional[Dict[Topic, dict]] = None):
+        """
+        Args:
+            capacity: maximum number of queued frames per topic, 0 means unbounded
+            overflow: the OverflowPolicy applied if the queue of a topic is full
+            dropout: max age (in seconds) of queued frames relative to incoming frames of the same topic
+            topic_queues: settings (capacity, overflow, dropout) per topic that override the default settings,
+                          the first matching topic is used
+        """
+        self._settings = {"capacity": capacity, "overflow": overflow, "dropout": dropout}
+        FrameBuffer(**self._settings)  # validate the default settings
+        self._topic_settings = []
+        if topic_queues is not None:
+            for topic, settings in topic_queues.items():
+                assert set(settings.keys()) <= set(FrameBuffer.SETTINGS), \
+                    f"unknown queue settings for {topic}: {settings}, use {FrameBuffer.SETTINGS}"
+                FrameBuffer(**settings)
+                self._topic_settings.append((topic, {**self._settings, **settings}))
+
+        self._mutex = Lock()
+        self._not_empty = Condition(self._mutex)
+        self._drained = Condition(self._mutex)
+        self._buffers = {}  # topic id -> FrameBuffer
+        self._not_full = {}  # topic id -> Condition
+        self._heads = []  # heap of (timestamp, seq, topic id, head frame), one entry per non-empty buffer
+        self._scheduled = set()  # topic ids of buffers that have an entry in the heap
+        self._seq = count()
+        self._control = deque()  # (control frame, [(buffer, number of pushed frames)])
+        self._closed = False
+        self._listener = None
+
+    def _add_buffer(self, topic: Topic) -> FrameBuffer:
+        settings = self._settings
+        for t, s in self._topic_settings:
+            if topic_registry.matches(topic.id, t.id):
+                settings = s
+                break
+        buffer = FrameBuffer(**settings)
+        self._buffers[topic.id] = buffer
+        self._not_full[topic.id] = Condition(self._mutex)
+        return buffer
+
+    def _schedule(self, topic_id: int, buffer: FrameBuffer):
+        head = buffer.peek()
+        heapq.heappush(self._heads, (head.timestamp, next(self._seq), topic_id, head))
+        self._scheduled.add(topic_id)
+
+    def put(self, frame: MSPDataFrame) -> Tuple[int, int]:
+        """
+        Adds a frame to the queue, blocks if the queue of its topic is full and the overflow policy is 'block'.
+        Returns:
+            the number of frames skipped due to dropout and dropped due to overflow
+        """
+        result = self._put(frame)
+        if self._listener is not None:
+            self._listener()
+        return result
+
+    def _put(self, frame: MSPDataFrame) -> Tuple[int, int]:
+        with self._mutex:
+            if frame.topic.is_control_topic:
+                # control messages must not overtake frames that were received before
+                barrier = [(b, b.num_pushed) for b in self._buffers.values() if len(b) > 0]
+                self._control.append((frame, barrier))
+                self._not_empty.notify()
+                return 0, 0
+
+            topic_id = frame.topic.id
+            buffer = self._buffers.get(topic_id)
+            if buffer is None:
+                buffer = self._add_buffer(frame.topic)
+            result = buffer.push(frame)
+            while result is None:
+                if self._closed:
+                    return 0, 1
+                self._not_full[topic_id].wait()
+                result = buffer.push(frame)
+
+            if topic_id not in self._scheduled:
+                self._schedule(topic_id, buffer)
+            self._not_empty.notify()
+            return result
+
+    def _control_ready(self) -> bool:
+        """ Returns whether the next control message can be returned, i.e., all frames received before were taken. """
+        if len(self._control) == 0:
+            return False
+        return all(b.num_removed >= n for b, n in self._control[0][1])
+
+    def _next_frame(self, control: bool = True) -> Optional[MSPDataFrame]:
+        """ Returns the next frame or None. If control is False, None is returned if a control message is next. """
+        if self._control_ready():
+            if not control:
+                return None
+            self._drained.notify_all()
+            return self._control.popleft()[0]
+
+        while len(self._heads) > 0:
+            _, _, topic_id, head = heapq.heappop(self._heads)
+            buffer = self._buffers[topic_id]
+            if len(buffer) == 0:
+                self._scheduled.discard(topic_id)
+                continue
+            if buffer.peek() is not head:
+                # the head was dropped or replaced since it was scheduled
+                self._schedule(topic_id, buffer)
+                continue
+
+            frame = buffer.pop()
+            if len(buffer) > 0:
+                self._schedule(topic_id, buffer)
+            else:
+                self._scheduled.discard(topic_id)
+            self._not_full[topic_id].notify()
+            self._drained.notify_all()
+            return frame
+        return None
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> MSPDataFrame:
+        """ Removes and returns the next frame, raises queue.Empty if no frame is available (see queue.Queue.get). """
+        with self._not_empty:
+            frame = self._next_frame()
+            if frame is not None:
+                return frame
+            if not block:
+                raise Empty
+
+            t_end = None if timeout is None else time.perf_counter() + timeout
+            while frame is None:
+                if t_end is None:
+                    self._not_empty.wait()
+                else:
+                    remaining = t_end - time.perf_counter()
+                    if remaining <= 0.:
+                        raise Empty
+                    self._not_empty.wait(remaining)
+                frame = self._next_frame()
+            return frame
+
+    def get_batch(self, max_frames: int, timeout: float = 0., block: bool = True) -> List[MSPDataFrame]:
+        """
+        Removes and returns up to max_frames frames. Blocks until the first frame is available (raises queue.Empty if
+        block is False), afterwards waits at most timeout seconds for further frames. A control message is always
+        returned as a batch of its own.
+        """
+        with self._not_empty:
+            frame = self._next_frame()
+            while frame is None:
+                if not block:
+                    raise Empty
+                self._not_empty.wait()
+                frame = self._next_frame()
+            frames = [frame]
+            if frame.topic.is_control_topic:
+                return frames
+
+            t_end = time.perf_counter() + timeout
+            while len(frames) < max_frames:
+                frame = self._next_frame(control=False)
+                if frame is None:
+                    remaining = t_end - time.perf_counter()
+                    if remaining <= 0. or self._control_ready():
+                        break
+                    self._not_empty.wait(remaining)
+                    continue
+                frames.append(frame)
+            return frames
+
+    def set_listener(self, listener: Optional[Callable[[], None]]):
+        """
+        Sets a callback that is called after each put, e.g., to wake up a consumer that does not block in get.
+        The callback is called from the producer's thread.
+        """
+        self._listener = listener
+
+    def close(self):
+        """ Releases blocked producers, frames that are put into a closed and full queue are dropped. """
+        with self._mutex:
+            self._closed = True
+            for not_full in self._not_full.values():
+                not_full.notify_all()
+
+    def wait_qsize(self, max_size: int, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until at most max_size frames are queued, e.g., to throttle a producer.
+        Returns:
+            False if the timeout expired before
+        """
+        with self._drained:
+            return self._drained.wait_for(lambda: self._qsize() <= max_size, timeout)
+
+    def _qsize(self) -> int:
+        return sum(len(b) for b in self._buffers.values()) + len(self._control)
+
+    def qsize(self) -> int:
+        with self._mutex:
+            return self._qsize()
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    @property
+    def capacity(self) -> int:
+        return self._settings["capacity"]
+
+    @property
+    def overflow(self) -> str:
+        return self._settings["overflow"]
+
+    @property
+    def is_unbounded(self) -> bool:
+        """ Returns whether frames are never dropped or blocked, i.e., no topic has a capacity or dropout. """
+        settings = [self._settings] + [s for _, s in self._topic_settings]
+        return all([s["capacity"] == 0 and not s["dropout"] for s in settings])
+
+    @property
+    def may_block(self) -> bool:
+        """ Returns whether put may block, i.e., whether a topic queue is bounded with overflow policy 'block'. """
+        settings = [self._settings] + [s for _, s in self._topic_settings]
+        return any([s["capacity"] > 0 and s["overflow"] == OverflowPolicy.BLOCK for s in settings])
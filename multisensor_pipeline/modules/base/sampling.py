@@ -1,38 +1,79 @@
 from abc import ABC
+from typing import Optional
 import logging
-from multisensor_pipeline.modules import BaseSource
-import time
-import sched
+from multisensor_pipeline.modules import BaseSource, BaseSink
+from multisensor_pipeline.modules.base.timer import TimerService, TimerStats, OverrunPolicy, get_timer_service
 
 logger = logging.getLogger(__name__)
 
 
 class BaseDiscreteSamplingSource(BaseSource, ABC):
+    """
+    Base class for sources that are updated periodically. Instead of running its own thread, the source is updated by
+    a timer service that is shared by all sampling sources, so on_update should return quickly. Frames are sent to the
+    observers from the timer thread as well, so their queues must not block (i.e., use the overflow policy 'block' with
+    a capacity), which would stall all sampling sources.
+    """
 
-    def __init__(self, samplerate: float = 1.):
+    def __init__(self, samplerate: float = 1., overrun: str = OverrunPolicy.BURST,
+                 timer_service: Optional[TimerService] = None):
         """
         Args:
             samplerate: set the intended samplerate in Hertz [Hz]
+            overrun: set the OverrunPolicy that is applied if on_update takes longer than the sampling period
+            timer_service: set the timer service that updates the source, default is the shared timer service
         """
         super().__init__()
+        assert overrun in OverrunPolicy.ALL, f"unknown overrun policy '{overrun}', use one of {OverrunPolicy.ALL}"
         self._samplerate = samplerate
         self._period_time = 1. / self._samplerate
-
-        self._scheduler = sched.scheduler(time.perf_counter, time.sleep)
+        self._overrun = overrun
+        self._timer_service = timer_service
+        self._timer = None
 
     @property
     def samplerate(self):
         return self._samplerate
 
-    def _worker(self):
-        t = time.perf_counter()
-        self._notify(self.on_update())
-        while self._active:
-            t_next = t + self._period_time
-            _ = self._scheduler.enterabs(
-                time=t_next,
-                priority=0,
-                action=lambda: self._notify(self.on_update())
-            )
-            t = t_next
-            self._scheduler.run(blocking=True)
+    @property
+    def timer_stats(self) -> Optional[TimerStats]:
+        """ Returns the jitter and overrun statistics of the source, if it was updated by the timer service. """
+        return None if self._timer is None else self._timer.stats
+
+    def start(self, threaded: bool = True):
+        """
+        Starts the module.
+        Args:
+           threaded: If True, the source is updated by the timer service. Otherwise, the source is only activated and
+                     must be driven by a pipeline runtime.
+        """
+        if threaded:
+            blocking_observers = [o.name for o in self._blocking_observers()]
+            assert len(blocking_observers) == 0, \
+                f"{self.name} is updated by the shared timer thread, so the queues of its observers " \
+                f"{blocking_observers} must not use the overflow policy 'block' with a capacity (use a drop policy)"
+        super().start(threaded=False)
+        if threaded:
+            if self._timer_service is None:
+                self._timer_service = get_timer_service()
+            self._timer = self._timer_service.schedule(self._step, self._period_time, overrun=self._overrun)
+
+    def _blocking_observers(self, source: Optional[BaseSource] = None) -> list:
+        """ Returns the observers whose put may block, including observers of fused processors. """
+        source = self if source is None else source
+        observers = []
+        for sinks in source._sinks.values():
+            for sink in sinks:
+                if not isinstance(sink, BaseSink):
+                    continue
+                if sink.fused:
+                    observers += self._blocking_observers(sink)
+                elif sink._queue.may_block:
+                    observers.append(sink)
+        return observers
+
+    def stop(self, blocking: bool = True):
+        # no frames must be sent after END_OF_STREAM
+        if self._timer is not None:
+            self._timer_service.cancel(self._timer, wait=blocking)
+        super().stop(blocking=blocking)
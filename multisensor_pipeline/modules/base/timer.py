@@ -0,0 +1,252 @@
+from itertools import count
+from threading import Thread, Condition, Lock, get_ident
+from typing import Callable, Optional
+import heapq
+import logging
+import math
+import os
+import time
+import weakref
+
+from multisensor_pipeline.modules.base.profiling import MSPModuleStats
+
+logger = logging.getLogger(__name__)
+
+
+def wait_until(deadline: float, spin_threshold: float = .001):
+    """
+    Sleeps until shortly before the deadline (time.perf_counter) and spins for the remaining time, which is more
+    precise than sleeping alone.
+    Args:
+        deadline: the time to wait for
+        spin_threshold: time (in seconds) before the deadline, from which the function spins instead of sleeping
+    """
+    remaining = deadline - time.perf_counter() - spin_threshold
+    if remaining > 0.:
+        time.sleep(remaining)
+    while time.perf_counter() < deadline:
+        time.sleep(0)  # spin, but let other threads run
+
+
+class OverrunPolicy:
+    """ Defines how a periodic timer continues, if its callback took longer than the period. """
+    SKIP = "skip"  # skip the missed ticks, stay on the original time grid
+    BURST = "burst"  # run the missed ticks back-to-back until the timer caught up
+    REPHASE = "rephase"  # run the late tick immediately and continue on a new time grid from there
+
+    ALL = [SKIP, BURST, REPHASE]
+
+
+class TimerStats:
+    """ Timing statistics of a periodic timer. """
+
+    def __init__(self):
+        self._jitter = MSPModuleStats.MovingAverageStats()
+        self._max_jitter = 0.
+        self._ticks = 0
+        self._overruns = 0
+        self._missed_ticks = 0
+
+    def add_tick(self, jitter: float):
+        """
+        Args:
+            jitter: time (in seconds) between the deadline and the actual start of the callback
+        """
+        self._jitter.update(jitter)
+        self._max_jitter = max(self._max_jitter, jitter)
+        self._ticks += 1
+
+    def add_overrun(self, missed_ticks: int):
+        """
+        Args:
+            missed_ticks: number of deadlines that passed while the callback was running
+        """
+        self._overruns += 1
+        self._missed_ticks += missed_ticks
+
+    @property
+    def ticks(self) -> int:
+        return self._ticks
+
+    @property
+    def mean_jitter(self) -> float:
+        return self._jitter.cma
+
+    @property
+    def recent_jitter(self) -> float:
+        return self._jitter.sma
+
+    @property
+    def max_jitter(self) -> float:
+        return self._max_jitter
+
+    @property
+    def overruns(self) -> int:
+        """ Number of callbacks that took longer than the period. """
+        return self._overruns
+
+    @property
+    def missed_ticks(self) -> int:
+        """ Number of deadlines that passed during overruns (skipped or caught up, depending on the policy). """
+        return self._missed_ticks
+
+
+class PeriodicTimer:
+    """ Handle of a callback that is called periodically by a TimerService. """
+
+    def __init__(self, callback: Callable[[], None], period: float, overrun: str, deadline: float):
+        self.callback = callback
+        self.period = period
+        self.overrun = overrun
+        self.deadline = deadline
+        self.cancelled = False
+        self.stats = TimerStats()
+
+    def _next_deadline(self, t_end: float) -> float:
+        """ Returns the next deadline after the callback of the current deadline returned at t_end. """
+        deadline = self.deadline + self.period
+        if t_end <= deadline:
+            return deadline
+
+        missed_ticks = int(math.floor((t_end - deadline) / self.period)) + 1
+        self.stats.add_overrun(missed_ticks)
+        if self.overrun == OverrunPolicy.SKIP:
+            return self.deadline + (missed_ticks + 1) * self.period
+        if self.overrun == OverrunPolicy.REPHASE:
+            return t_end
+        return deadline  # burst
+
+
+class TimerService:
+    """
+    Calls periodic callbacks at absolute deadlines from a single thread, e.g., the update of all sampling sources of a
+    process. The thread sleeps until shortly before the next deadline and spins for the remaining time, which is more
+    precise than sleeping alone. Callbacks share the thread, so they must return quickly.
+    """
+
+    def __init__(self, spin_threshold: float = .001):
+        """
+        Args:
+            spin_threshold: time (in seconds) before a deadline, from which the timer thread spins instead of sleeping
+        """
+        self._spin_threshold = spin_threshold
+        self._condition = Condition()
+        self._timers = []  # heap of (deadline, seq, timer)
+        self._seq = count()
+        self._running = None  # timer whose callback is running
+        self._thread = None
+        self._thread_id = None
+        _timer_services.add(self)
+
+    def _reset(self):
+        self._condition = Condition()
+        self._timers = []
+        self._running = None
+        self._thread = None
+        self._thread_id = None
+
+    def schedule(self, callback: Callable[[], None], period: float, overrun: str = OverrunPolicy.BURST,
+                 start: Optional[float] = None) -> PeriodicTimer:
+        """
+        Calls the callback every period seconds until the timer is cancelled.
+        Args:
+            callback: function without arguments
+            period: time between two calls in seconds
+            overrun: the OverrunPolicy applied if the callback takes longer than the period
+            start: time (time.perf_counter) of the first call, default is now
+        """
+        assert overrun in OverrunPolicy.ALL, f"unknown overrun policy '{overrun}', use one of {OverrunPolicy.ALL}"
+        assert period > 0, f"period must be positive, but was {period}"
+        timer = PeriodicTimer(callback, period, overrun, time.perf_counter() if start is None else start)
+        with self._condition:
+            self._ensure_thread()
+            self._push(timer)
+            self._condition.notify_all()
+        return timer
+
+    def cancel(self, timer: PeriodicTimer, wait: bool = True):
+        """
+        Stops calling the timer's callback.
+        Args:
+            timer: a timer returned by schedule
+            wait: if True, waits until a running call of the callback returned (except if called from the callback)
+        """
+        with self._condition:
+            timer.cancelled = True
+            if not wait or get_ident() == self._thread_id:
+                return
+            while self._running is timer:
+                self._condition.wait()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        self._thread = Thread(target=self._worker, name="msp-timer", daemon=True)
+        self._thread.start()
+
+    def _push(self, timer: PeriodicTimer):
+        heapq.heappush(self._timers, (timer.deadline, next(self._seq), timer))
+
+    def _next_timer(self) -> PeriodicTimer:
+        """ Waits until the next deadline is closer than the spin threshold and returns its timer. """
+        with self._condition:
+            while True:
+                while len(self._timers) > 0 and self._timers[0][2].cancelled:
+                    heapq.heappop(self._timers)
+                if len(self._timers) == 0:
+                    self._condition.wait()
+                    continue
+                remaining = self._timers[0][0] - time.perf_counter() - self._spin_threshold
+                if remaining > 0.:
+                    self._condition.wait(remaining)  # a new timer could have an earlier deadline
+                    continue
+                timer = heapq.heappop(self._timers)[2]
+                self._running = timer
+                return timer
+
+    def _worker(self):
+        self._thread_id = get_ident()
+        while True:
+            timer = self._next_timer()
+            wait_until(timer.deadline, self._spin_threshold)
+            if not timer.cancelled:
+                t_start = time.perf_counter()
+                timer.stats.add_tick(t_start - timer.deadline)
+                try:
+                    timer.callback()
+                except Exception:
+                    logger.exception(f"[TIMER FAILED] {timer.callback}")
+                    timer.cancelled = True
+                timer.deadline = timer._next_deadline(time.perf_counter())
+
+            with self._condition:
+                self._running = None
+                if not timer.cancelled:
+                    self._push(timer)
+                self._condition.notify_all()
+
+
+_timer_services = weakref.WeakSet()
+_default_timer_service = None
+_default_timer_service_lock = Lock()
+
+
+def _after_fork_in_child():
+    # the timer threads do not exist in forked child processes, their locks could even be held
+    global _default_timer_service_lock
+    _default_timer_service_lock = Lock()
+    for service in list(_timer_services):
+        service._reset()
+
+
+if hasattr(os, "register_at_fork"):  # not available on Windows, where child processes are spawned
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def get_timer_service() -> TimerService:
+    """ Returns the timer service that is shared by all sampling sources of the process. """
+    global _default_timer_service
+    with _default_timer_service_lock:
+        if _default_timer_service is None:
+            _default_timer_service = TimerService()
+        return _default_timer_service
@@ -0,0 +1,181 @@
+from typing import Optional
+import copy
+import logging
+import multiprocessing as mp
+import weakref
+
+import numpy as np
+from PIL import Image
+
+from multisensor_pipeline.dataframe import MSPDataFrame
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8, only Transport.QUEUE is available
+    shared_memory = None
+
+logger = logging.getLogger(__name__)
+
+
+class Transport:
+    """ Defines how frames are sent to and from the child process of a MultiprocessModuleWrapper. """
+    QUEUE = "queue"  # frames are pickled and sent through a multiprocessing.Queue
+    SHARED_MEMORY = "shared_memory"  # large payloads are written into a SharedMemoryQueue (see below)
+
+    ALL = [QUEUE, SHARED_MEMORY]
+
+
+class _SlotRef:
+    """ Placeholder for a payload that was written into a slot of a SharedMemoryQueue. """
+
+    __slots__ = ("slot", "dtype", "shape", "is_image")
+
+    def __init__(self, slot: int, dtype: np.dtype, shape: tuple, is_image: bool):
+        self.slot = slot
+        self.dtype = dtype
+        self.shape = shape
+        self.is_image = is_image
+
+    def __getstate__(self):
+        return self.slot, self.dtype, self.shape, self.is_image
+
+    def __setstate__(self, state):
+        self.slot, self.dtype, self.shape, self.is_image = state
+
+
+if shared_memory is not None:
+    class _SharedMemory(shared_memory.SharedMemory):
+
+        def __del__(self):
+            # the finalizer of the last view can drop the last reference, before the view released the buffer
+            try:
+                self.close()
+            except BufferError:
+                pass  # the memory is unmapped when the views were garbage collected
+
+
+class SharedMemoryQueue:
+    """
+    Sends dataframes to another process like a multiprocessing.Queue, but large ndarray and image payloads are not
+    pickled. They are written once into one of num_slots fixed-size slots of a shared memory block, only the header of
+    the frame (topic, timestamp, slot, dtype, shape) is pickled and sent through a queue. The receiver gets a read-only
+    view on the slot, i.e., arrays are not copied again (images are restored from the view). A slot is reused when all
+    views on it were garbage collected, so receivers that keep frames (e.g., ListSink) use up the slots. Frames that do
+    not fit into a slot, small payloads and frames that are sent while all slots are in use are pickled as usual.
+
+    There must be only one sending process. The queue is created by the parent process, which removes the shared
+    memory on close. Requires Python 3.8 or newer (multiprocessing.shared_memory).
+    """
+
+    _IMAGE_MODES = ["L", "RGB", "RGBA"]  # modes that are restored by Image.fromarray
+
+    def __init__(self, num_slots: int = 8, slot_size: int = 1920 * 1080 * 4, min_size: int = 1 << 16,
+                 context: Optional[mp.context.BaseContext] = None):
+        """
+        Args:
+            num_slots: max number of payloads that are in shared memory at the same time
+            slot_size: size (in bytes) of a slot, i.e., of the largest payload that is sent via shared memory.
+                       Default fits an RGBA HD image.
+            min_size: size (in bytes) of the smallest payload that is sent via shared memory, pickling is faster for
+                      small payloads
+            context: the multiprocessing context of the processes that use the queue (default context if None)
+        """
+        assert shared_memory is not None, "SharedMemoryQueue requires multiprocessing.shared_memory (Python 3.8+)"
+        assert num_slots > 0 and slot_size > 0, "num_slots and slot_size must be positive"
+        self._num_slots = num_slots
+        self._slot_size = slot_size
+        self._min_size = min_size
+        self._shm = _SharedMemory(create=True, size=num_slots * slot_size)
+        context = mp.get_context() if context is None else context
+        self._in_use = context.RawArray('b', num_slots)  # set by the sender, reset by the receiver
+        self._free_slots = context.Semaphore(num_slots)
+        self._headers = context.Queue()
+        self._next_slot = 0
+        self._owner = True
+        self._closed = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_owner"] = False
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+
+    @property
+    def num_slots(self) -> int:
+        return self._num_slots
+
+    @property
+    def slot_size(self) -> int:
+        return self._slot_size
+
+    def _payload(self, data) -> Optional[np.ndarray]:
+        """ Returns the array that is written into a slot, None if the payload is pickled. """
+        if isinstance(data, Image.Image):
+            if data.mode not in self._IMAGE_MODES:
+                return None
+            data = np.asarray(data)
+        elif not isinstance(data, np.ndarray) or data.dtype.hasobject:
+            return None
+        if not self._min_size <= data.nbytes <= self._slot_size:
+            return None
+        return data
+
+    def _acquire_slot(self) -> Optional[int]:
+        if not self._free_slots.acquire(block=False):
+            return None
+        # the semaphore guarantees a free slot, only the sender marks slots as used
+        while self._in_use[self._next_slot]:
+            self._next_slot = (self._next_slot + 1) % self._num_slots
+        slot = self._next_slot
+        self._in_use[slot] = 1
+        self._next_slot = (slot + 1) % self._num_slots
+        return slot
+
+    def _release_slot(self, slot: int):
+        self._in_use[slot] = 0
+        self._free_slots.release()
+
+    def _view(self, slot: int, dtype: np.dtype, shape: tuple) -> np.ndarray:
+        count = int(np.prod(shape, dtype=np.int64))
+        return np.frombuffer(self._shm.buf, dtype=dtype, count=count, offset=slot * self._slot_size)
+
+    def put(self, frame: MSPDataFrame):
+        payload = self._payload(frame.data)
+        slot = None if payload is None else self._acquire_slot()
+        if slot is None:
+            self._headers.put(frame)
+            return
+
+        self._view(slot, payload.dtype, payload.shape).reshape(payload.shape)[...] = payload
+        # the frame could be consumed by other sinks, so the header is a copy
+        header = copy.copy(frame)
+        header.data = _SlotRef(slot, payload.dtype, payload.shape, isinstance(frame.data, Image.Image))
+        self._headers.put(header)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> MSPDataFrame:
+        frame = self._headers.get(block=block, timeout=timeout)
+        ref = frame.data
+        if not isinstance(ref, _SlotRef):
+            return frame
+
+        view = self._view(ref.slot, ref.dtype, ref.shape)
+        view.flags.writeable = False
+        # derived arrays reference the view, the slot is released when all of them were garbage collected
+        weakref.finalize(view, self._release_slot, ref.slot)
+        view = view.reshape(ref.shape)
+        frame.data = Image.fromarray(view) if ref.is_image else view
+        return frame
+
+    def empty(self) -> bool:
+        return self._headers.empty()
+
+    def close(self):
+        """
+        Removes the shared memory block when the child process ended (only by the parent). Mapped views stay valid
+        until they are garbage collected.
+        """
+        if self._owner and not self._closed:
+            self._closed = True
+            self._shm.unlink()
@@ -1,7 +1,5 @@
-import collections
-
 from pynput import  keyboard
-from multisensor_pipeline.modules.base import BaseSource
+from multisensor_pipeline.modules.base import BaseCallbackSource
 from multisensor_pipeline.dataframe import  MSPDataFrame, Topic
 from typing import Optional, List
 import logging
@@ -9,7 +7,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class KeyboardSource(BaseSource):
+class KeyboardSource(BaseCallbackSource):
     """
     Source for keyboard input. Can observe keyboard press and releases of button
     """
@@ -18,9 +16,7 @@ class KeyboardSource(BaseSource):
         super().__init__()
         self.press = press
         self.release = release
-        self.stop_listener = False
         self.listener = None
-        self.queue = collections.deque()
         self._keypress_topic = Topic(name="keyboard.press", dtype=str)
         self._keyrelease_topic = Topic(name="keyboard.release", dtype=str)
 
@@ -36,20 +32,13 @@ class KeyboardSource(BaseSource):
 
     def on_press(self, key):
         frame = MSPDataFrame(topic=self._keypress_topic, data=key)
-        self.queue.append(frame)
+        self.put_frame(frame)
 
     def on_release(self, key):
         frame = MSPDataFrame(topic=self._keyrelease_topic, data=key)
-        self.queue.append(frame)
-
-    def on_update(self) -> Optional[MSPDataFrame]:
-        while not self.queue:
-            if self.stop_listener:
-                return
-        return self.queue.popleft()
+        self.put_frame(frame)
 
     def on_stop(self):
-        self.stop_listener = True
         self.listener.stop()
 
     @property
@@ -1,8 +1,6 @@
-import collections
-
 import typing
 from pynput import mouse
-from multisensor_pipeline.modules.base import BaseSource
+from multisensor_pipeline.modules.base import BaseCallbackSource
 from multisensor_pipeline.dataframe import  MSPDataFrame, Topic
 from typing import Optional, List, Tuple, Dict, Generic, Any
 import logging
@@ -10,7 +8,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class Mouse(BaseSource):
+class Mouse(BaseCallbackSource):
     """
     Source for mouse input. Can observe mouse movement, scroll and clicks.
     Sends MSPEventFrame when mouse changes are detected
@@ -21,9 +19,7 @@ class Mouse(BaseSource):
         self.move = move
         self.click = click
         self.scroll = scroll
-        self.stop_listener = False
         self.listener = None
-        self.queue = collections.deque()
         self._mouse_scroll_topic = Topic(name="mouse.scroll", dtype=Tuple[float, float])
         self._mouse_click_topic = Topic(name="mouse.click", dtype=Dict)
         self._mouse_move_topic = Topic(name="mouse.coordinates", dtype=Tuple[float,float])
@@ -42,26 +38,19 @@ class Mouse(BaseSource):
 
     def on_move(self, x, y):
         frame = MSPDataFrame(topic=self._mouse_move_topic, data=(x, y))
-        self.queue.append(frame)
+        self.put_frame(frame)
 
     def on_click(self, x, y, button, pressed):
         frame = MSPDataFrame(topic=self._mouse_click_topic,
                              data={"point": (x, y), "button": button, "pressed": pressed})
-        self.queue.append(frame)
+        self.put_frame(frame)
 
     def on_scroll(self, x, y, dx, dy):
         frame = MSPDataFrame(topic=self._mouse_scroll_topic,
                              data=(dx, dy))
-        self.queue.append(frame)
-
-    def on_update(self) -> Optional[MSPDataFrame]:
-        while not self.queue:
-            if self.stop_listener:
-                return
-        return self.queue.popleft()
+        self.put_frame(frame)
 
     def on_stop(self):
-        self.stop_listener = True
         self.listener.stop()
 
     @property
@@ -1,13 +1,133 @@
 from abc import ABC, abstractmethod
 from multisensor_pipeline.dataframe import MSPDataFrame, MSPControlMessage
-from multisensor_pipeline.modules.base import BaseSink, BaseSource, BaseModule, BaseProcessor
-from typing import Optional
+from multisensor_pipeline.modules.base import BaseSink, BaseSource, BaseModule, BaseProcessor, MSPModuleStats
+from multisensor_pipeline.modules.base.transport import SharedMemoryQueue, Transport
+from collections import deque
+from queue import Empty
+from typing import Optional, Union, List
+from threading import Thread, Condition, Event
 import multiprocessing as mp
+from multiprocessing import forkserver
 import logging
+import pickle
 
 logger = logging.getLogger(__name__)
 
 
+class StartMethod:
+    """ Defines how the child processes of MultiprocessModuleWrappers are started (see multiprocessing). """
+    FORK = "fork"  # copies the parent process, fast but unsafe if the parent runs threads (not on Windows/macOS)
+    SPAWN = "spawn"  # starts a new interpreter, which imports all modules again
+    FORKSERVER = "forkserver"  # forks a server process, which imported the preload modules once (not on Windows)
+
+    ALL = [FORK, SPAWN, FORKSERVER]
+
+
+# modules imported by the fork server, such that they are ready in each child process (missing modules are skipped)
+DEFAULT_PRELOAD_MODULES = ["numpy", "PIL.Image", "msgpack", "av", "zmq", "multisensor_pipeline.modules"]
+
+_default_start_method = None
+
+
+def _check_start_method(start_method: Optional[str]):
+    assert start_method is None or start_method in StartMethod.ALL, \
+        f"unknown start method '{start_method}', use one of {StartMethod.ALL}"
+    assert start_method is None or start_method in mp.get_all_start_methods(), \
+        f"start method '{start_method}' is not available on this platform, use one of {mp.get_all_start_methods()}"
+
+
+def set_start_method(start_method: Optional[str], preload_modules: Optional[List[str]] = None):
+    """
+    Sets the start method of MultiprocessModuleWrappers that do not specify one. Using the fork server, the preload
+    modules are imported once by a server process that is started right away. Child processes are forked from it, so
+    they start within milliseconds, even though the parent process could be running threads.
+    Args:
+        start_method: a StartMethod, None uses the default of multiprocessing
+        preload_modules: modules imported by the fork server, default is DEFAULT_PRELOAD_MODULES. The wrapped modules
+                         should be included, e.g., "multisensor_pipeline.modules.video".
+    """
+    global _default_start_method
+    _check_start_method(start_method)
+    _default_start_method = start_method
+    if start_method == StartMethod.FORKSERVER:
+        warm_up_forkserver(preload_modules)
+
+
+def warm_up_forkserver(preload_modules: Optional[List[str]] = None):
+    """
+    Starts the fork server of multiprocessing, if it is not running yet. The preload modules are only applied if the
+    server is not running.
+    """
+    context = mp.get_context(StartMethod.FORKSERVER)
+    context.set_forkserver_preload(DEFAULT_PRELOAD_MODULES if preload_modules is None else list(preload_modules))
+    forkserver.ensure_running()
+
+
+class _StatsChannel:
+    """
+    Sends snapshots of the MSPModuleStats of a wrapped module from the child process to the parent process. The
+    child process reports periodically while profiling is enabled, and a last time when the module stopped.
+    """
+
+    def __init__(self, context: mp.context.BaseContext, interval: float):
+        self._enabled = context.Event()
+        self._queue = context.Queue()
+        self._interval = interval
+        self._snapshot = None
+        self._receiver = None  # thread of the parent process
+        self._reporter = None  # thread of the child process
+        self._stopped = None
+
+    def enable(self):
+        """ Enables the reports and receives them (parent process), must be called before the module starts. """
+        self._enabled.set()
+        self._receiver = Thread(target=self._receive, daemon=True)
+        self._receiver.start()
+
+    def _receive(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            self._snapshot = pickle.loads(data)
+
+    @property
+    def snapshot(self) -> Optional[MSPModuleStats]:
+        """ Returns the last reported stats, None if nothing was reported yet. """
+        return self._snapshot
+
+    def join(self, timeout: float = 1.):
+        """ Waits for the last report (parent process), after the child process ended. """
+        if self._receiver is not None:
+            self._receiver.join(timeout)
+
+    def start_reporting(self, module: BaseModule):
+        """ Enables profiling of the module and reports its stats periodically (child process). """
+        if not self._enabled.is_set():
+            return
+        module.profiling = True
+        self._stopped = Event()
+        self._reporter = Thread(target=self._report, args=(module,), daemon=True)
+        self._reporter.start()
+
+    def _report(self, module: BaseModule):
+        while not self._stopped.wait(self._interval):
+            self._send(module)
+
+    def _send(self, module: BaseModule):
+        # the worker of the module keeps updating the stats while they are pickled
+        self._queue.put(pickle.dumps(module.stats.snapshot()))
+
+    def stop_reporting(self, module: BaseModule):
+        """ Sends the last report (child process). """
+        if self._reporter is None:
+            return
+        self._stopped.set()
+        self._reporter.join()
+        self._send(module)
+        self._queue.put(None)
+
+
 def initialize_module_and_wait_for_start(module_cls, module_args, init_event, start_event) -> BaseModule:
     module = module_cls(**module_args)
     assert isinstance(module, BaseModule)
@@ -20,18 +140,59 @@ def initialize_module_and_wait_for_start(module_cls, module_args, init_event, st
 
 class MultiprocessModuleWrapper(BaseModule, ABC):
 
-    def __init__(self, module_cls: type, **module_args):
+    def __init__(self, module_cls: type, transport: str = Transport.QUEUE, transport_args: Optional[dict] = None,
+                 start_method: Optional[str] = None, stats_interval: float = 1., **module_args):
+        """
+        Runs a module in a child process.
+        Args:
+            module_cls: the class of the wrapped module, it is instantiated in the child process
+            transport: the Transport used to send frames to and from the child process, use Transport.SHARED_MEMORY
+                       for large ndarray or image payloads, e.g., HD video frames
+            transport_args: keyword arguments of the SharedMemoryQueue (num_slots, slot_size, min_size)
+            start_method: the StartMethod of the child process, default is set by set_start_method. The module_cls
+                          and module_args must be picklable, unless the process is forked.
+            stats_interval: time (in seconds) between two reports of the profiling stats of the wrapped module, if
+                            profiling is enabled (see stats)
+            **module_args: keyword arguments of the wrapped module
+        """
         super(MultiprocessModuleWrapper, self).__init__()
+        assert transport in Transport.ALL, f"unknown transport '{transport}', use one of {Transport.ALL}"
+        start_method = _default_start_method if start_method is None else start_method
+        _check_start_method(start_method)
+        if start_method == StartMethod.FORKSERVER:
+            warm_up_forkserver()
+        self._context = mp.get_context(start_method)
 
         self._wrapped_module_cls = module_cls
         self._wrapped_module_args = module_args
-
-        self._init_event = mp.Event()
-        self._start_event = mp.Event()
-        self._stop_event = mp.Event()
+        self._transport = transport
+        self._transport_args = {} if transport_args is None else transport_args
+        self._shared_memory_queues = []
+        self._stats_interval = stats_interval
+        self._stats_channel = _StatsChannel(self._context, stats_interval)
+
+        self._init_event = self._context.Event()
+        self._start_event = self._context.Event()
+        self._stop_event = self._context.Event()
+        self._start_processes()
+
+    def _start_processes(self):
         self._process = self._init_process()
         self._process.start()
 
+    def _create_queue(self) -> Union[mp.Queue, SharedMemoryQueue]:
+        """ Creates a queue between the parent and the child process according to the transport. """
+        if self._transport == Transport.QUEUE:
+            return self._context.Queue()
+        queue = SharedMemoryQueue(context=self._context, **self._transport_args)
+        self._shared_memory_queues.append(queue)
+        return queue
+
+    def _close_queues(self):
+        """ Removes the shared memory of the queues, after the child process ended. """
+        for queue in self._shared_memory_queues:
+            queue.close()
+
     @abstractmethod
     def _init_process(self) -> mp.Process:
         raise NotImplementedError()
@@ -42,8 +203,24 @@ class MultiprocessModuleWrapper(BaseModule, ABC):
 
     def on_start(self):
         self._init_event.wait()  # Wait until initialization is finished
+        if self._profiling:
+            self._stats_channel.enable()
         self._start_event.set()  # Start the main loop of the process
 
+    @property
+    def stats(self) -> MSPModuleStats:
+        """
+        Returns the profiling information of the wrapped module, which is reported periodically by the child process
+        (see stats_interval). The stats of the wrapper are returned until the first report arrived.
+        """
+        snapshot = self._stats_channel.snapshot
+        return self._stats if snapshot is None else snapshot
+
+    @property
+    def wrapper_stats(self) -> MSPModuleStats:
+        """ Returns the profiling information of the wrapper, i.e., of sending frames to and from the child process. """
+        return self._stats
+
     @staticmethod
     @abstractmethod
     def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue):
@@ -53,20 +230,24 @@ class MultiprocessModuleWrapper(BaseModule, ABC):
 class MultiprocessSourceWrapper(MultiprocessModuleWrapper, BaseSource):
 
     def _init_process(self) -> mp.Process:
-        self._queue_out = mp.Queue()
-        return mp.Process(target=self._process_worker,
-                          args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
-                                self._start_event, self._stop_event, self._queue_out))
+        self._queue_out = self._create_queue()
+        return self._context.Process(target=self._process_worker,
+                                     args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
+                                           self._start_event, self._stop_event, self._queue_out,
+                                           self._stats_channel))
 
     @staticmethod
-    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_out):
+    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_out,
+                        stats_channel):
         module = initialize_module_and_wait_for_start(module_cls, module_args, init_event, start_event)
         assert isinstance(module, BaseSource)
 
+        stats_channel.start_reporting(module)
         module.add_observer(queue_out)
         module.start()
         stop_event.wait()
         module.stop()
+        stats_channel.stop_reporting(module)
 
     def on_update(self) -> Optional[MSPDataFrame]:
         return self._queue_out.get()
@@ -76,6 +257,8 @@ class MultiprocessSourceWrapper(MultiprocessModuleWrapper, BaseSource):
         # ask module process to stop
         self._stop_event.set()
         self._process.join()
+        self._stats_channel.join()
+        self._close_queues()
 
     def stop(self, blocking=False):
         """ Stops the module. """
@@ -88,19 +271,23 @@ class MultiprocessSourceWrapper(MultiprocessModuleWrapper, BaseSource):
 class MultiprocessSinkWrapper(MultiprocessModuleWrapper, BaseSink):
 
     def _init_process(self) -> mp.Process:
-        self._queue_in = mp.Queue()
-        return mp.Process(target=self._process_worker,
-                          args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
-                                self._start_event, self._stop_event, self._queue_in))
+        self._queue_in = self._create_queue()
+        return self._context.Process(target=self._process_worker,
+                                     args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
+                                           self._start_event, self._stop_event, self._queue_in,
+                                           self._stats_channel))
 
     @staticmethod
-    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_in):
+    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_in,
+                        stats_channel):
         module = initialize_module_and_wait_for_start(module_cls, module_args, init_event, start_event)
         assert isinstance(module, BaseSink)
 
+        stats_channel.start_reporting(module)
         module.start()
         while not stop_event.is_set() or not queue_in.empty():
             module.put(queue_in.get())
+        stats_channel.stop_reporting(module)
 
     def on_update(self, frame: MSPDataFrame):
         self._queue_in.put(frame)
@@ -112,6 +299,8 @@ class MultiprocessSinkWrapper(MultiprocessModuleWrapper, BaseSink):
         eof_msg = MSPControlMessage(message=MSPControlMessage.END_OF_STREAM)
         self._queue_in.put(eof_msg)
         self._process.join()
+        self._stats_channel.join()
+        self._close_queues()
 
     def stop(self, blocking=False):
         """ Stops the module. """
@@ -120,24 +309,310 @@ class MultiprocessSinkWrapper(MultiprocessModuleWrapper, BaseSink):
 
 
 class MultiprocessProcessorWrapper(MultiprocessSinkWrapper, MultiprocessSourceWrapper, BaseProcessor):
+    """
+    Runs a processor in a child process. Inputs and outputs are decoupled: the worker thread sends incoming frames to
+    the child process, while a receiver thread sends the processed frames to the observers. Thus, several frames are
+    in flight, such that sending frames overlaps with processing them, and the wrapped processor may drop frames
+    (on_update returns None) or send several frames per input. The wrapped processor does not run its own worker thread
+    in the child process, its frames are handled as they arrive. Batching processors handle the frames that are
+    available, without waiting for batch_timeout.
+    """
+
+    def __init__(self, module_cls: type, in_flight_window: int = 8, **kwargs):
+        """
+        Args:
+            module_cls: the class of the wrapped processor
+            in_flight_window: max number of frames that were sent to the child process, but not processed yet
+            **kwargs: arguments of MultiprocessModuleWrapper and of the wrapped processor
+        """
+        assert in_flight_window >= 1, f"in_flight_window must be at least 1, but was {in_flight_window}"
+        assert kwargs.get("parallelism", 1) == 1, \
+            f"{module_cls.__name__} can not use parallelism in a child process, use MultiprocessPoolProcessorWrapper"
+        self._in_flight_window = in_flight_window
+        self._receiver = Thread(target=self._receiver_worker)
+        super(MultiprocessProcessorWrapper, self).__init__(module_cls, **kwargs)
 
     def _init_process(self) -> mp.Process:
-        self._queue_in = mp.Queue()
-        self._queue_out = mp.Queue()
-        return mp.Process(target=self._process_worker,
-                          args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
-                                self._start_event, self._stop_event, self._queue_in, self._queue_out))
+        self._queue_in = self._create_queue()
+        self._queue_out = self._create_queue()
+        self._in_flight = self._context.Semaphore(self._in_flight_window)
+        return self._context.Process(target=self._process_worker,
+                                     args=(self._wrapped_module_cls, self._wrapped_module_args, self._init_event,
+                                           self._start_event, self._stop_event, self._queue_in, self._queue_out,
+                                           self._in_flight, self._stats_channel))
+
+    def on_start(self):
+        super(MultiprocessProcessorWrapper, self).on_start()
+        self._receiver.start()
 
     def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+        # processed frames are sent by the receiver thread
+        while not self._in_flight.acquire(timeout=.1):
+            if not self._process.is_alive():
+                logger.warning(f"[DROPPED] the process of {self.name}.{self._wrapped_module_cls.__name__} ended")
+                return None
         self._queue_in.put(frame)
-        return self._queue_out.get()
+        return None
+
+    def _receiver_worker(self):
+        """ Sends the frames of the child process to the observers, until the wrapped processor stopped. """
+        while True:
+            frame = self._queue_out.get()
+            if frame.topic.is_control_topic:
+                if frame.data == MSPControlMessage.END_OF_STREAM:
+                    return
+                continue
+            self._notify(frame)
+
+    def stop(self, blocking=False):
+        """ Stops the module, after the frames in flight were processed and sent. """
+        self._stop_process()
+        if self._receiver.is_alive():
+            # the wrapped processor sends an end of stream message, unless its process failed
+            self._queue_out.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+            self._receiver.join()
+        super(MultiprocessModuleWrapper, self).stop(blocking=blocking)
 
     @staticmethod
-    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_in, queue_out):
+    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_in, queue_out,
+                        in_flight, stats_channel):
         module = initialize_module_and_wait_for_start(module_cls, module_args, init_event, start_event)
         assert isinstance(module, BaseProcessor)
 
+        stats_channel.start_reporting(module)
         module.add_observer(queue_out)
-        module.start()
-        while not stop_event.is_set():
-            module.put(queue_in.get())
+        # frames are handled by the loop below instead of a worker thread, such that a frame is not in flight anymore
+        # when it was processed (or dropped by the queue of the module)
+        if module.fusable:
+            module.fuse()
+        module.start(threaded=False)
+        while True:
+            frame = queue_in.get()
+            module.put(frame)
+            if not module.fused:
+                MultiprocessProcessorWrapper._handle_queued_frames(module)
+            in_flight.release()
+            if frame.topic.is_control_topic and frame.data == MSPControlMessage.END_OF_STREAM:
+                break
+        # the wrapped processor sent its remaining frames and an end of stream message
+        stats_channel.stop_reporting(module)
+
+    @staticmethod
+    def _handle_queued_frames(module: BaseProcessor):
+        """ Handles the frames (or batches) in the queue of a processor that batches or drops frames. """
+        batched = module._batch_size > 1
+        process = module._process_frame_batch if batched else module._process_frame
+        while module.active:
+            try:
+                item = module._queue.get_batch(module._batch_size, block=False) if batched else module._queue.get(block=False)
+            except Empty:
+                return
+            process(item)
+
+
+class Scheduling:
+    """ Defines how a MultiprocessPoolProcessorWrapper distributes frames to its worker processes. """
+    ROUND_ROBIN = "round_robin"  # the workers take turns
+    LEAST_LOADED = "least_loaded"  # the worker with the fewest frames in flight
+
+    ALL = [ROUND_ROBIN, LEAST_LOADED]
+
+
+class _PoolWorker:
+    """ A worker process of a MultiprocessPoolProcessorWrapper and the sequence numbers of its frames in flight. """
+
+    def __init__(self, process: mp.Process, init_event, queue_in, queue_out, stats_channel: _StatsChannel):
+        self.process = process
+        self.init_event = init_event
+        self.queue_in = queue_in
+        self.queue_out = queue_out
+        self.stats_channel = stats_channel
+        self.pending = deque()
+        self.receiver = None
+        self.failed = False  # the process ended unexpectedly, no frames are scheduled to it
+
+
+class MultiprocessPoolProcessorWrapper(MultiprocessModuleWrapper, BaseProcessor):
+    """
+    Runs a stateless processor in several child processes, e.g., to extract image features on all cores. Each worker
+    process holds its own instance of the processor. Incoming frames are distributed to the workers and the processed
+    frames are sent in input order. The wrapped processor may drop frames (on_update returns None) or send several
+    frames per input. If a worker process ends unexpectedly, its frames in flight are dropped and the remaining workers
+    take over.
+    """
+
+    # marks that a worker finished a frame, its outputs were sent before
+    _FRAME_DONE = "FRAME_DONE"
+
+    def __init__(self, module_cls: type, workers: Optional[int] = None, scheduling: str = Scheduling.LEAST_LOADED,
+                 in_flight_window: int = 4, **kwargs):
+        """
+        Args:
+            module_cls: the class of the wrapped processor, it must be stateless (class attribute or argument)
+            workers: number of worker processes (default: number of CPUs)
+            scheduling: the Scheduling policy that selects the worker of an incoming frame
+            in_flight_window: max number of frames per worker that were sent, but not processed yet
+            **kwargs: arguments of MultiprocessModuleWrapper and of the wrapped processor
+        """
+        assert getattr(module_cls, "stateless", False) or kwargs.get("stateless", False), \
+            f"{module_cls.__name__} is not stateless, it can not be distributed to several processes"
+        workers = mp.cpu_count() if workers is None else workers
+        assert workers >= 1, f"workers must be at least 1, but was {workers}"
+        assert scheduling in Scheduling.ALL, f"unknown scheduling '{scheduling}', use one of {Scheduling.ALL}"
+        assert in_flight_window >= 1, f"in_flight_window must be at least 1, but was {in_flight_window}"
+        self._num_workers = workers
+        self._scheduling = scheduling
+        self._in_flight_window = in_flight_window
+        self._workers: List[_PoolWorker] = []
+        self._next_worker = 0
+        self._next_input = 0  # sequence number of the next incoming frame
+        self._next_output = 0  # sequence number of the next frame whose outputs are sent
+        self._results = {}  # sequence number -> outputs of finished frames that wait for their predecessors
+        self._condition = Condition()
+        super(MultiprocessPoolProcessorWrapper, self).__init__(module_cls, **kwargs)
+
+    def _start_processes(self):
+        for _ in range(self._num_workers):
+            self._init_process().start()
+
+    def _init_process(self) -> mp.Process:
+        init_event = self._context.Event()
+        queue_in = self._create_queue()
+        queue_out = self._create_queue()
+        stats_channel = _StatsChannel(self._context, self._stats_interval)
+        process = self._context.Process(target=self._process_worker,
+                                        args=(self._wrapped_module_cls, self._wrapped_module_args, init_event,
+                                              self._start_event, self._stop_event, queue_in, queue_out,
+                                              stats_channel))
+        worker = _PoolWorker(process, init_event, queue_in, queue_out, stats_channel)
+        worker.receiver = Thread(target=self._receiver_worker, args=(worker,))
+        self._workers.append(worker)
+        return process
+
+    def on_start(self):
+        for worker in self._workers:
+            worker.init_event.wait()
+            if self._profiling:
+                worker.stats_channel.enable()
+        self._start_event.set()
+        for worker in self._workers:
+            worker.receiver.start()
+
+    @property
+    def worker_stats(self) -> List[Optional[MSPModuleStats]]:
+        """
+        Returns the profiling information of the wrapped processor per worker process, None until the first report of
+        a worker arrived. The stats property returns the stats of the pool as a whole.
+        """
+        return [worker.stats_channel.snapshot for worker in self._workers]
+
+    def _select_worker(self) -> Optional[_PoolWorker]:
+        """ Returns the worker of the next frame, None if it is busy (the caller waits). Failed workers are skipped. """
+        if self._scheduling == Scheduling.ROUND_ROBIN:
+            while self._workers[self._next_worker].failed:
+                self._next_worker = (self._next_worker + 1) % self._num_workers
+            worker = self._workers[self._next_worker]
+        else:
+            worker = min([w for w in self._workers if not w.failed], key=lambda w: len(w.pending))
+        if len(worker.pending) >= self._in_flight_window:
+            return None
+        self._next_worker = (self._next_worker + 1) % self._num_workers
+        return worker
+
+    def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+        # processed frames are sent by the receiver threads
+        with self._condition:
+            while True:
+                if all([w.failed for w in self._workers]):
+                    logger.warning(f"[DROPPED] all processes of {self.name}.{self._wrapped_module_cls.__name__} ended")
+                    return None
+                worker = self._select_worker()
+                if worker is not None:
+                    break
+                # the receivers notify about finished frames and failed workers
+                self._condition.wait(.1)
+            worker.pending.append(self._next_input)
+            self._next_input += 1
+        worker.queue_in.put(frame)
+        return None
+
+    def _receiver_worker(self, worker: _PoolWorker):
+        """ Collects the outputs of a worker per frame and sends all finished frames in input order. """
+        outputs = []
+        while True:
+            try:
+                frame = worker.queue_out.get(timeout=.1)
+            except Empty:
+                if worker.process.is_alive():
+                    continue
+                logger.warning(f"[WORKER FAILED] a process of {self.name}.{self._wrapped_module_cls.__name__} ended, "
+                               f"its frames in flight are dropped")
+                with self._condition:
+                    worker.failed = True
+                    while len(worker.pending) > 0:
+                        self._finish_frame(worker.pending.popleft(), [])
+                    self._condition.notify_all()
+                return
+            if not frame.topic.is_control_topic:
+                outputs.append(frame)
+                continue
+            if frame.data == MSPControlMessage.END_OF_STREAM:
+                return
+            if frame.data != self._FRAME_DONE:
+                continue
+
+            with self._condition:
+                self._finish_frame(worker.pending.popleft(), outputs)
+                self._condition.notify_all()
+            outputs = []
+
+    def _finish_frame(self, seq: int, outputs: List[MSPDataFrame]):
+        """ Stores the outputs of a frame and sends all finished frames in input order (holding the condition). """
+        self._results[seq] = outputs
+        while self._next_output in self._results:
+            for new_frame in self._results.pop(self._next_output):
+                self._notify(new_frame)
+            self._next_output += 1
+
+    def _stop_process(self):
+        logger.debug("stopping: {}.{}".format(self.name, self._wrapped_module_cls.__name__))
+        self._stop_event.set()
+        eof_msg = MSPControlMessage(message=MSPControlMessage.END_OF_STREAM)
+        for worker in self._workers:
+            worker.queue_in.put(eof_msg)
+        for worker in self._workers:
+            worker.process.join()
+            worker.stats_channel.join()
+            # the wrapped processor sends an end of stream message, the receiver of a failed process drops its frames
+            if worker.receiver.is_alive():
+                worker.receiver.join()
+        self._close_queues()
+
+    def stop(self, blocking=False):
+        """ Stops the module, after the frames in flight were processed and sent. """
+        self._stop_process()
+        super(MultiprocessModuleWrapper, self).stop(blocking=blocking)
+
+    @staticmethod
+    def _process_worker(module_cls: type, module_args: dict, init_event, start_event, stop_event, queue_in,
+                        queue_out, stats_channel):
+        module = initialize_module_and_wait_for_start(module_cls, module_args, init_event, start_event)
+        assert isinstance(module, BaseProcessor)
+
+        stats_channel.start_reporting(module)
+        module.add_observer(queue_out)
+        # frames are handled synchronously, such that all outputs of a frame are sent before it is marked as done
+        module.start(threaded=False)
+        done_msg = MSPControlMessage(message=MultiprocessPoolProcessorWrapper._FRAME_DONE)
+        while True:
+            frame = queue_in.get()
+            if frame.topic.is_control_topic:
+                break
+            try:
+                module._process_frame(frame)
+            except Exception:
+                logger.exception(f"[UPDATE FAILED] {module.uuid}")
+            queue_out.put(done_msg)
+        # sends an end of stream message
+        module.stop(blocking=False)
+        stats_channel.stop_reporting(module)
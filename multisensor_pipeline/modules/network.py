@@ -1,17 +1,26 @@
 from multisensor_pipeline.modules.base import BaseSink, BaseSource
 from multisensor_pipeline.dataframe.dataframe import MSPDataFrame, Topic
-from typing import Optional, List
+from multisensor_pipeline.dataframe.codecs import ImageEncoder, get_image_codec
+from typing import Optional, List, Union, Dict
 import zmq
 import logging
-import msgpack
 
 logger = logging.getLogger(__name__)
 
 
 class ZmqPublisher(BaseSink):
 
-    def __init__(self, protocol='tcp', url='*', port=5000):
+    def __init__(self, protocol='tcp', url='*', port=5000, image_codec: Optional[Union[str, ImageEncoder]] = None,
+                 topic_image_codecs: Optional[Dict[str, Union[str, ImageEncoder]]] = None):
+        """
+        Args:
+            image_codec: codec for Image.Image payloads (default: JPEG with quality 90)
+            topic_image_codecs: codecs for Image.Image payloads of specific topics (by topic name)
+        """
         super(ZmqPublisher, self).__init__()
+        self._image_codec = get_image_codec(image_codec)
+        topic_image_codecs = topic_image_codecs if topic_image_codecs is not None else {}
+        self._topic_image_codecs = {name: get_image_codec(c) for name, c in topic_image_codecs.items()}
 
         self.protocol = protocol
         self.url = url
@@ -21,7 +30,8 @@ class ZmqPublisher(BaseSink):
         self.socket.bind("{}://{}:{}".format(self.protocol, self.url, self.port))
 
     def on_update(self, frame: MSPDataFrame):
-        self.socket.send(data=frame.serialize())
+        image_codec = self._topic_image_codecs.get(frame.topic.name, self._image_codec)
+        self.socket.send(data=frame.serialize(image_codec=image_codec))
 
     def on_stop(self):
         self.socket.close()
@@ -31,8 +31,15 @@ class RandomArraySource(BaseDiscreteSamplingSource):
 
 class ArrayManipulationProcessor(BaseProcessor):
 
-    def __init__(self, numpy_operation):
-        super().__init__()
+    def __init__(self, numpy_operation, stateless: bool = False, **kwargs):
+        """
+        Args:
+            numpy_operation: function that is applied to the data of each frame
+            stateless: set to True, if the numpy operation does not keep state between calls (enables parallelism)
+            kwargs: options of BaseProcessor
+        """
+        self.stateless = stateless
+        super().__init__(**kwargs)
         self._op = numpy_operation
 
     def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
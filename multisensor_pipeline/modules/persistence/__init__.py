@@ -1,3 +1,3 @@
-from .dataset import BaseDatasetSource
+from .dataset import BaseDatasetSource, PlaybackClock
 from .recording import RecordingSink, DefaultRecordingSink
 from .replay import DefaultReplaySource
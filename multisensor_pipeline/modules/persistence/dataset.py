@@ -1,27 +1,209 @@
 from abc import ABC
 from multisensor_pipeline.dataframe import MSPDataFrame
-from multisensor_pipeline.modules import BaseSource
-from typing import Optional
+from multisensor_pipeline.modules import BaseSource, BaseSink
+from multisensor_pipeline.modules.base.queues import FrameQueue
+from multisensor_pipeline.modules.base.timer import TimerStats, wait_until
+from typing import Callable, List, Optional
+from threading import Condition
 import time
-import sched
+
+
+class PlaybackClock:
+    """
+    Maps the timestamps of recorded dataframes to playback times. The clock is anchored to the first frame, which is
+    played immediately. All further frames are played at absolute deadlines relative to it, so waiting errors do not
+    accumulate over the recording.
+
+    A clock can be shared by several dataset sources, which then play against one common timeline, e.g., to replay
+    eye tracking data, video and audio in sync. The first frame of any source anchors the timeline, unless seek is
+    called before the sources are started. The playback can be paused, resumed, sped up or slowed down, and moved to
+    another position while the sources are running.
+    """
+
+    def __init__(self, playback_speed: float = 1., spin_threshold: float = .001):
+        """
+        Args:
+            playback_speed: sets the playback speed (1 is original playback speed)
+            spin_threshold: time (in seconds) before a deadline, from which the clock spins instead of sleeping
+        """
+        self._check_speed(playback_speed)
+        self._playback_speed = playback_speed
+        self._spin_threshold = spin_threshold
+        self._condition = Condition()
+        self._anchor = None  # (frame timestamp, playback time)
+        self._paused_at = None  # frame timestamp at which the playback was paused
+        self._position = None  # frames before the position of the last seek are skipped
+        self._num_seeks = 0
+
+    @staticmethod
+    def _check_speed(playback_speed: float):
+        assert 0. < playback_speed < float("inf"), \
+            f"playback_speed must be positive and finite, but was {playback_speed}"
+
+    @property
+    def playback_speed(self) -> float:
+        return self._playback_speed
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    @property
+    def num_seeks(self) -> int:
+        """ Returns how often seek was called, sources use it to detect that they have to rewind. """
+        return self._num_seeks
+
+    @property
+    def seek_position(self) -> Optional[float]:
+        """ Returns the frame timestamp of the last seek. """
+        return self._position
+
+    def _timestamp_at(self, t: float) -> Optional[float]:
+        if self._paused_at is not None:
+            return self._paused_at
+        if self._anchor is None:
+            return None
+        t_frame, t_playback = self._anchor
+        return t_frame + (t - t_playback) * self._playback_speed
+
+    def position(self) -> Optional[float]:
+        """ Returns the frame timestamp that is currently played, None if the playback did not start. """
+        with self._condition:
+            return self._timestamp_at(time.perf_counter())
+
+    def _reanchor(self, timestamp: Optional[float]):
+        if timestamp is not None:
+            self._anchor = (timestamp, time.perf_counter())
+        self._condition.notify_all()
+
+    def set_playback_speed(self, playback_speed: float):
+        """ Changes the playback speed, frames that were played already keep their timing. """
+        self._check_speed(playback_speed)
+        with self._condition:
+            timestamp = self._timestamp_at(time.perf_counter())
+            self._playback_speed = playback_speed
+            if self._paused_at is None:
+                self._reanchor(timestamp)
+
+    def pause(self):
+        """ Pauses the playback, sources wait until resume is called. """
+        with self._condition:
+            if self._paused_at is None and self._anchor is not None:
+                self._paused_at = self._timestamp_at(time.perf_counter())
+
+    def resume(self):
+        """ Continues the playback at the position where it was paused. """
+        with self._condition:
+            if self._paused_at is not None:
+                timestamp, self._paused_at = self._paused_at, None
+                self._reanchor(timestamp)
+
+    def seek(self, timestamp: float):
+        """
+        Moves the playback to the given frame timestamp. Frames before it are skipped. Sources that can rewind (see
+        BaseDatasetSource.on_seek) restart from the beginning, if the position is moved backwards.
+        """
+        with self._condition:
+            self._position = timestamp
+            self._num_seeks += 1
+            if self._paused_at is not None:
+                self._paused_at = timestamp
+            self._reanchor(timestamp)
+
+    def deadline(self, timestamp: float) -> Optional[float]:
+        """ Returns the playback time (time.perf_counter) of a frame with the given timestamp, None while paused. """
+        with self._condition:
+            return self._deadline(timestamp)
+
+    def _deadline(self, timestamp: float) -> Optional[float]:
+        if self._paused_at is not None:
+            return None
+        if self._anchor is None:
+            self._anchor = (timestamp, time.perf_counter())
+        t_frame, t_playback = self._anchor
+        return t_playback + (timestamp - t_frame) / self._playback_speed
+
+    def interrupt(self):
+        """ Wakes up all waiting sources, e.g., to let them check whether they were stopped. """
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, timestamp: float, max_lateness: Optional[float] = None, stats: Optional[TimerStats] = None,
+             active: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Waits until a frame with the given timestamp is due.
+        Args:
+            timestamp: the timestamp of the frame
+            max_lateness: frames that are more than max_lateness seconds behind their deadline are late
+            stats: records the timing error of played frames (jitter) and the number of dropped late frames (overruns)
+            active: the waiting is aborted if it returns False (checked whenever the clock is interrupted)
+        Returns:
+            False if the frame is late, before the position of the last seek or the waiting was aborted
+        """
+        with self._condition:
+            while True:
+                if active is not None and not active():
+                    return False
+                if self._position is not None and timestamp < self._position:
+                    return False
+                deadline = self._deadline(timestamp)
+                if deadline is None:
+                    self._condition.wait()  # paused
+                    continue
+                remaining = deadline - time.perf_counter() - self._spin_threshold
+                if remaining <= 0.:
+                    break
+                # the timeline could be changed while waiting
+                self._condition.wait(remaining)
+
+        wait_until(deadline, self._spin_threshold)
+        error = time.perf_counter() - deadline
+        if max_lateness is not None and error > max_lateness:
+            if stats is not None:
+                stats.add_overrun(1)
+            return False
+        if stats is not None:
+            stats.add_tick(error)
+        return True
 
 
 class BaseDatasetSource(BaseSource, ABC):
     """
     Base Module for DatasetSources
     """
-    def __init__(self, playback_speed: float = float("inf")):
+    def __init__(self, playback_speed: float = float("inf"), max_lateness: Optional[float] = None,
+                 clock: Optional[PlaybackClock] = None, timestamp_offset: float = 0.,
+                 high_watermark: Optional[int] = None, low_watermark: Optional[int] = None):
         """
         Initializes the BaseDatasetSource
         Args:
             playback_speed: sets the playback speed (1 is original playback speed). Default set to as fast as possible.
+            max_lateness: sets the max time (in seconds) a frame may be behind its playback time, later frames are
+                          dropped instead of being sent in a burst. Default (None) sends all frames.
+            clock: sets a PlaybackClock that is shared with other dataset sources, its playback speed is used
+            timestamp_offset: sets the offset (in seconds) that maps the frame timestamps onto the timeline of the
+                              clock, e.g., to align a video (timestamps start at 0) with a recording
+            high_watermark: sets the max number of queued frames of downstream sinks and processors: if a queue is
+                            longer, the source pauses until all queues are at most low_watermark long. This bounds the
+                            memory of fast replays without dropping frames. Default (None) disables flow control.
+            low_watermark: sets the queue size at which a paused source continues (default: high_watermark // 2)
         """
         super(BaseDatasetSource, self).__init__()
         self._playback_speed = float(playback_speed)
-        self._last_frame_timestamp = None
-        self._last_playback_timestamp = None
-        if not self._playback_speed == float("inf"):
-            self._scheduler = sched.scheduler(time.perf_counter, time.sleep)
+        self._max_lateness = max_lateness
+        self._timestamp_offset = timestamp_offset
+        self._clock = clock
+        if clock is None and not self._playback_speed == float("inf"):
+            self._clock = PlaybackClock(playback_speed=self._playback_speed)
+        self._playback_stats = None if self._clock is None else TimerStats()
+        self._num_seeks = None
+        if high_watermark is not None and low_watermark is None:
+            low_watermark = high_watermark // 2
+        assert high_watermark is None or 0 <= low_watermark <= high_watermark, \
+            f"low_watermark must be between 0 and high_watermark, but was {low_watermark}"
+        self._high_watermark = high_watermark
+        self._low_watermark = low_watermark
+        self._downstream_queues = None
 
     @property
     def eof(self):
@@ -29,11 +211,70 @@ class BaseDatasetSource(BaseSource, ABC):
 
     @property
     def playback_speed(self):
-        return self._playback_speed
+        return self._playback_speed if self._clock is None else self._clock.playback_speed
+
+    @property
+    def clock(self) -> Optional[PlaybackClock]:
+        return self._clock
+
+    @property
+    def playback_stats(self) -> Optional[TimerStats]:
+        """ Returns the timing error and the number of dropped late frames, None if the playback speed is unlimited. """
+        return self._playback_stats
+
+    def on_seek(self, timestamp: float) -> bool:
+        """
+        Custom rewind routine, called by the source's worker after the clock was moved to the given frame timestamp.
+        Sources that can rewind restart from the beginning if the timestamp is before the current frame.
+        Returns:
+            True if the source rewound, i.e., the current frame is outdated and dropped
+        """
+        return False
 
     def _auto_stop(self):
         self.stop(blocking=False)
 
+    def _waiting(self) -> bool:
+        """ Returns whether the worker can keep waiting for the clock, i.e., it is active and did not miss a seek """
+        return self._active and self._clock.num_seeks == self._num_seeks
+
+    def _handle_seek(self) -> bool:
+        """ Checks whether the clock was moved since the last frame and returns whether the source rewound. """
+        num_seeks = self._clock.num_seeks
+        if self._num_seeks is None or self._num_seeks == num_seeks:
+            self._num_seeks = num_seeks
+            return False
+        self._num_seeks = num_seeks
+        return self.on_seek(self._clock.seek_position - self._timestamp_offset)
+
+    def _get_downstream_queues(self) -> List[FrameQueue]:
+        """ Returns the input queues of all sinks and processors that (transitively) receive frames of the source. """
+        queues = []
+        visited = set()
+        observers = [o for sinks in self._sinks.values() for o in sinks]
+        while len(observers) > 0:
+            observer = observers.pop()
+            if not isinstance(observer, BaseSink) or id(observer) in visited:
+                continue
+            visited.add(id(observer))
+            queues.append(observer._queue)
+            if isinstance(observer, BaseSource):
+                observers.extend([o for sinks in observer._sinks.values() for o in sinks])
+        return queues
+
+    def _wait_for_credit(self):
+        """ Pauses the source if a downstream queue exceeds the high watermark, until all reach the low watermark. """
+        if self._downstream_queues is None:
+            self._downstream_queues = self._get_downstream_queues()
+        if all([q.qsize() <= self._high_watermark for q in self._downstream_queues]):
+            return
+
+        while self._active:
+            full_queues = [q for q in self._downstream_queues if q.qsize() > self._low_watermark]
+            if len(full_queues) == 0:
+                return
+            full_queues[0].wait_qsize(self._low_watermark, timeout=.1)
+
     def _notify(self, frame: Optional[MSPDataFrame]):
         """
         If the frame is not null (End of Dataset) it notifies all observers that there's a new dataframe else it stops
@@ -44,56 +285,30 @@ class BaseDatasetSource(BaseSource, ABC):
             self._auto_stop()
             return
 
-        if self._playback_speed == float("inf") or frame.topic.is_control_topic:
+        if frame.topic.is_control_topic:
             super(BaseDatasetSource, self)._notify(frame)
             return
 
-        def _idle():
-            pass
-
-        # schedule the notification of the next dataframe
-        t_target = time.perf_counter()
-        if self._last_frame_timestamp is not None:
-            original_delta = frame.timestamp - self._last_frame_timestamp
-            target_delta = original_delta / self._playback_speed
-            t_target = self._last_playback_timestamp + target_delta
-            if time.perf_counter() < t_target:
-                _ = self._scheduler.enterabs(
-                    time=t_target,
-                    priority=0,
-                    action=lambda: _idle()  # do nothing, we just want to wait here
-                )
-                # wait until the dataframe shall be sent
-                self._scheduler.run(blocking=True)
-
-        # send the dataframe (will be done immediately for the first frame)
-        self._last_frame_timestamp = frame.timestamp
-        self._last_playback_timestamp = t_target
-        super(BaseDatasetSource, self)._notify(frame)
-
-    def _sleep(self, frame: MSPDataFrame):
-        """
-        Modifies the dataframe timestamp corresponding the playback speed.
-        Sleeps if necessary to achieve correct playback speed
-        Args:
-            frame:  Dataframe
-        """
-        if self._playback_speed == float("inf"):
-            return
-        if frame.topic.is_control_topic:
+        if self._high_watermark is not None:
+            self._wait_for_credit()
+        if self._clock is None:
+            super(BaseDatasetSource, self)._notify(frame)
             return
 
-        t_now = time.perf_counter()
-
-        # if this is not the first frame
-        if self._last_frame_timestamp is not None:
-            original_delta = frame.timestamp - self._last_frame_timestamp
-            target_delta = original_delta / self._playback_speed
-
-            actual_delta = time.perf_counter() - self._last_playback_timestamp
-            if actual_delta < target_delta:
-                time.sleep(target_delta - actual_delta)
-        # else: don't wait and return -> this will issue the first frame immediately and the next one will be scheduled
+        # wait until the dataframe shall be sent (the first frame is sent immediately)
+        while True:
+            if self._handle_seek():
+                return
+            played = self._clock.wait(frame.timestamp + self._timestamp_offset, max_lateness=self._max_lateness,
+                                      stats=self._playback_stats, active=self._waiting)
+            if self._clock.num_seeks == self._num_seeks:
+                break
+        if played:
+            super(BaseDatasetSource, self)._notify(frame)
 
-        self._last_frame_timestamp = frame.timestamp
-        self._last_playback_timestamp = time.perf_counter()
+    def stop(self, blocking: bool = True):
+        if self._clock is not None:
+            # wake up the worker if it waits for the clock
+            self._active = False
+            self._clock.interrupt()
+        super(BaseDatasetSource, self).stop(blocking=blocking)
@@ -1,7 +1,8 @@
 from abc import ABC
-from typing import List, Optional
+from typing import List, Optional, Union, Dict
 from multisensor_pipeline.modules.base import BaseSink
-from multisensor_pipeline.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe import MSPDataFrame, Topic, ImageEncoder, get_image_codec
+from multisensor_pipeline.dataframe.registry import topic_registry
 from pathlib import Path
 
 
@@ -22,15 +23,16 @@ class RecordingSink(BaseSink, ABC):
     def override(self) -> bool:
         return self._override
 
-    def __init__(self, target, topics: Optional[List[Topic]] = None, override=False):
+    def __init__(self, target, topics: Optional[List[Topic]] = None, override=False, **kwargs):
         """
         initializes RecordingSink
         Args:
             target: filepath
             topics: Filter which topics should be recorded
             override: Flag to set overwrite rules
+            kwargs: queue and batching options of BaseSink, e.g., batch_size
         """
-        super(RecordingSink, self).__init__()
+        super(RecordingSink, self).__init__(**kwargs)
 
         # set target path or file
         self._target = Path(target)
@@ -38,6 +40,7 @@ class RecordingSink(BaseSink, ABC):
             self._target.mkdir(parents=True, exist_ok=True)
         # set topic filter
         self._topics = topics
+        self._accepted_topics = {}  # topic id -> whether the topic passes the filter
         # set override flag
         self._override = override
 
@@ -45,16 +48,30 @@ class RecordingSink(BaseSink, ABC):
         """Check whether the given topic shall be captured."""
         if self._topics is None:
             return True
-        return any([t == topic for t in self._topics])
+        accepted = self._accepted_topics.get(topic.id)
+        if accepted is None:
+            accepted = any([topic_registry.matches(t.id, topic.id) for t in self._topics])
+            self._accepted_topics[topic.id] = accepted
+        return accepted
 
     def on_update(self, frame: MSPDataFrame):
         if self.check_topic(frame.topic):
             self.write(frame)
 
+    def on_update_batch(self, frames: List[MSPDataFrame]):
+        frames = [frame for frame in frames if self.check_topic(frame.topic)]
+        if len(frames) > 0:
+            self.write_batch(frames)
+
     def write(self, frame):
         """ Custom write routine. """
         raise NotImplementedError()
 
+    def write_batch(self, frames: List[MSPDataFrame]):
+        """ Custom write routine for batches of frames, calls write for each frame by default. """
+        for frame in frames:
+            self.write(frame)
+
 
 class DefaultRecordingSink(RecordingSink):
     """
@@ -64,6 +81,24 @@ class DefaultRecordingSink(RecordingSink):
 
     _file_handle = None
 
+    def __init__(self, target, topics: Optional[List[Topic]] = None, override=False,
+                 image_codec: Optional[Union[str, ImageEncoder]] = None,
+                 topic_image_codecs: Optional[Dict[str, Union[str, ImageEncoder]]] = None, **kwargs):
+        """
+        initializes DefaultRecordingSink
+        Args:
+            target: filepath
+            topics: Filter which topics should be recorded
+            override: Flag to set overwrite rules
+            image_codec: codec for Image.Image payloads (default: JPEG with quality 90)
+            topic_image_codecs: codecs for Image.Image payloads of specific topics (by topic name)
+            kwargs: queue and batching options of BaseSink, e.g., batch_size
+        """
+        super(DefaultRecordingSink, self).__init__(target=target, topics=topics, override=override, **kwargs)
+        self._image_codec = get_image_codec(image_codec)
+        topic_image_codecs = topic_image_codecs if topic_image_codecs is not None else {}
+        self._topic_image_codecs = {name: get_image_codec(c) for name, c in topic_image_codecs.items()}
+
     def on_start(self):
         assert self.target.suffix == ".msgpack", f"The file extension must be json, but was {self.target.suffix}"
         if not self.override:
@@ -71,8 +106,15 @@ class DefaultRecordingSink(RecordingSink):
 
         self._file_handle = self.target.open(mode="wb")
 
+    def _serialize(self, frame: MSPDataFrame) -> bytes:
+        image_codec = self._topic_image_codecs.get(frame.topic.name, self._image_codec)
+        return frame.serialize(image_codec=image_codec)
+
     def write(self, frame):
-        self._file_handle.write(frame.serialize())
+        self._file_handle.write(self._serialize(frame))
+
+    def write_batch(self, frames: List[MSPDataFrame]):
+        self._file_handle.write(b"".join([self._serialize(frame) for frame in frames]))
 
     def on_stop(self):
         self._file_handle.close()
@@ -20,6 +20,7 @@ class DefaultReplaySource(BaseDatasetSource):
         self._file_path = Path(file_path)
         self._file_handle = None
         self._unpacker = None
+        self._last_timestamp = None
 
         assert self._file_path.exists() and self._file_path.is_file()
         assert self._file_path.suffix == ".msgpack"
@@ -38,10 +39,22 @@ class DefaultReplaySource(BaseDatasetSource):
             frame = None
 
         if frame is not None:
+            self._last_timestamp = frame.timestamp
             return frame
         else:
             # EOF is reached -> auto-stop (you can alternatively return None)
             self._auto_stop()
 
+    def on_seek(self, timestamp: float) -> bool:
+        """
+        Restarts the replay from the beginning of the file, if the clock was moved before the current frame
+        """
+        if self._last_timestamp is None or timestamp >= self._last_timestamp:
+            return False
+        self._file_handle.close()
+        self.on_start()
+        self._last_timestamp = None
+        return True
+
     def on_stop(self):
         self._file_handle.close()
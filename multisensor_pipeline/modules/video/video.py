@@ -11,9 +11,9 @@ class PyAVSource(BaseDatasetSource, ABC):
 
     def __init__(
             self, file: str, av_format: Optional[str] = None, av_options: Optional[dict] = None,
-            playback_speed: float = float("inf")
+            playback_speed: float = float("inf"), **kwargs
     ):
-        super(PyAVSource, self).__init__(playback_speed=playback_speed)
+        super(PyAVSource, self).__init__(playback_speed=playback_speed, **kwargs)
 
         self._file = file
         self._av_format = av_format
@@ -60,8 +60,8 @@ class PyAVSource(BaseDatasetSource, ABC):
 
 class VideoSource(PyAVSource):
 
-    def __init__(self, file: str, playback_speed: float = 1.):
-        super(VideoSource, self).__init__(file=file, playback_speed=playback_speed)
+    def __init__(self, file: str, playback_speed: float = 1., **kwargs):
+        super(VideoSource, self).__init__(file=file, playback_speed=playback_speed, **kwargs)
 
 
 class VideoSink(BaseSink):
@@ -1 +1,3 @@
 from .graph import GraphPipeline
+from .runtime import PipelineRuntime, ThreadRuntime, AsyncioRuntime, PoolRuntime, OfflineRuntime, \
+    register_runtime, get_runtime
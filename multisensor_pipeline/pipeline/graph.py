@@ -1,4 +1,5 @@
 from .base import PipelineBase
+from .runtime import PipelineRuntime, get_runtime
 from multisensor_pipeline.modules.base import *
 import networkx as nx
 from typing import Union, List, Optional
@@ -12,9 +13,18 @@ class GraphPipeline(PipelineBase):
     ROLE_PROCESSOR = "processor"
     ROLE_SINK = "sink"
 
-    def __init__(self, profiling=False):
+    def __init__(self, profiling=False, runtime: Union[str, PipelineRuntime] = "thread", fuse: bool = False):
+        """
+        Args:
+            profiling: enables profiling for all modules that are added to the pipeline
+            runtime: the execution engine, i.e., "thread" (one thread per module), "asyncio" (one event loop for all
+                     processors and sinks), or a PipelineRuntime instance
+            fuse: fuses chains of processors at start, such that each chain is handled by a single worker
+        """
         self._profiling = profiling
         self._graph = nx.DiGraph()
+        self._runtime = get_runtime(runtime)
+        self._fuse = fuse
 
     def add(self, modules: Union[BaseModule, List[BaseModule]]):
         if isinstance(modules, list):
@@ -93,6 +103,14 @@ class GraphPipeline(PipelineBase):
     def nodes(self):
         return self._graph.nodes()
 
+    @property
+    def graph(self) -> nx.DiGraph:
+        return self._graph
+
+    @property
+    def runtime(self) -> PipelineRuntime:
+        return self._runtime
+
     @property
     def active_modules(self):
         """ Number of active modules. Not counting queues. """
@@ -126,35 +144,38 @@ class GraphPipeline(PipelineBase):
 
         return True
 
-    def _has_inactive_successors(self, node):
-        return any([not n.active for n in self._graph.successors(node)])
-
-    def _start_reversed(self, node):
-        """ Starts nodes in a depth first search. """
-        if isinstance(node, BaseModule):
-            # start module (queues don't need to be started)
-            node.start()
-        for n in self._graph.predecessors(node):
-            if self._has_inactive_successors(n):
-                continue  # will be started when coming from another sink node
-            if n.active:
+    def fuse_processor_chains(self) -> List[BaseProcessor]:
+        """
+        Fuses each processor into its predecessor, if the predecessor is a processor that has no other successor.
+        This way, a chain of processors is handled by the worker of its first processor, which calls on_update of the
+        others inline. Processors that batch, parallelize or drop frames are not fused.
+        Returns:
+            the fused processors
+        """
+        fused = []
+        for node in self.processor_nodes:
+            predecessors = list(self._graph.predecessors(node))
+            if len(predecessors) != 1 or not isinstance(predecessors[0], BaseProcessor):
+                continue
+            if len(list(self._graph.successors(predecessors[0]))) != 1 or not node.fusable or node.fused:
                 continue
-            self._start_reversed(n)
+            node.fuse()
+            fused.append(node)
+        return fused
 
     def start(self):
         """ Start the pipeline. """
         self.check_pipeline()
-        for node in self.sink_nodes:
-            self._start_reversed(node)
+        if self._fuse:
+            self.fuse_processor_chains()
+        self._runtime.start(self)
 
     def stop(self):
         """ Stop the pipeline. """
-        for node in self.source_nodes:
-            node.stop(blocking=False)
+        self._runtime.stop(self)
 
     def join(self):
-        for node in self.sink_nodes:
-            node.join()
+        self._runtime.join(self)
 
     def __enter__(self):
         self.start()
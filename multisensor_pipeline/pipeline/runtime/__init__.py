@@ -0,0 +1,8 @@
+from .base import PipelineRuntime, register_runtime, get_runtime
+from .threads import ThreadRuntime
+from .event_loop import AsyncioRuntime
+from .pool import PoolRuntime
+from .offline import OfflineRuntime
+
+for _runtime_cls in [ThreadRuntime, AsyncioRuntime, PoolRuntime, OfflineRuntime]:
+    register_runtime(_runtime_cls)
@@ -0,0 +1,51 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Union
+
+
+class PipelineRuntime(ABC):
+    """
+    Base class for execution engines of a GraphPipeline. A runtime starts the modules of a pipeline, drives their
+    workers and waits for them to terminate.
+    """
+
+    name = None
+
+    @abstractmethod
+    def start(self, pipeline):
+        """ Starts all modules of the (checked) pipeline. """
+        raise NotImplementedError()
+
+    def stop(self, pipeline):
+        """ Stops all sources, the remaining modules stop when they received END_OF_STREAM from all sources. """
+        for node in pipeline.source_nodes:
+            node.stop(blocking=False)
+
+    @abstractmethod
+    def join(self, pipeline):
+        """ Waits until all sinks of the pipeline terminated. """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return self.__class__.__name__
+
+
+_runtimes: Dict[str, type] = {}
+
+
+def register_runtime(runtime_cls: type):
+    """ Registers a runtime class, such that it can be selected by its name, e.g., GraphPipeline(runtime="thread"). """
+    assert issubclass(runtime_cls, PipelineRuntime), "Runtimes must inherit from PipelineRuntime"
+    assert runtime_cls.name is not None, "Runtimes must define a name"
+    _runtimes[runtime_cls.name] = runtime_cls
+
+
+def get_runtime(runtime: Union[str, PipelineRuntime]) -> PipelineRuntime:
+    """
+    Returns a runtime instance.
+    Args:
+        runtime: a runtime instance or the name of a registered runtime (using default settings)
+    """
+    if isinstance(runtime, PipelineRuntime):
+        return runtime
+    assert runtime in _runtimes, f"Unknown runtime '{runtime}', available: {list(_runtimes.keys())}"
+    return _runtimes[runtime]()
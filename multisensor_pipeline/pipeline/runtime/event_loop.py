@@ -0,0 +1,204 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Empty
+from threading import Thread, Event, get_ident
+from typing import Callable, List, Optional
+import asyncio
+import logging
+import time
+
+from multisensor_pipeline.modules.base import BaseModule, BaseSink, BaseSource, BaseProcessor
+from multisensor_pipeline.modules.base.sampling import BaseDiscreteSamplingSource
+from .base import PipelineRuntime
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncioRuntime(PipelineRuntime):
+    """
+    Runs the modules of a pipeline as asyncio tasks on a single event loop thread instead of one thread per module.
+
+    Processors and sinks are woken up by their input queues when frames arrive. Sampling sources
+    (BaseDiscreteSamplingSource) are paced by the event loop. All other sources are expected to block in on_update
+    (e.g., while waiting for a device) and can not be interrupted by the event loop, so each of them still runs on its
+    own (daemon) thread, like with the thread runtime. When the pipeline ends, sources that are still active are
+    stopped, and threads that never return from on_update do not keep the interpreter alive.
+
+    Modules that are known to block (e.g., a processor that calls a remote service) should be passed as offload, their
+    on_update calls run on a thread pool from the start. Otherwise, a module whose on_update takes longer than
+    blocking_threshold is offloaded from then on, which keeps its frames in order. Note that this is detected after the
+    first slow call: an on_update that blocks for a long time (or never returns) stalls all modules on the event loop.
+
+    Batching modules handle the frames that are available, without waiting for batch_timeout. Processors with
+    parallelism > 1 keep their own worker thread, fused processors are handled by their predecessor.
+    """
+
+    name = "asyncio"
+
+    def __init__(self, blocking_threshold: Optional[float] = .005, max_workers: int = 4,
+                 offload: Optional[List[BaseModule]] = None):
+        """
+        Args:
+            blocking_threshold: duration (in seconds) of an on_update call after which the module is offloaded, None
+                                disables the detection, i.e., only the modules passed as offload are offloaded
+            max_workers: number of threads for offloaded modules
+            offload: modules (processors, sinks or sampling sources) that are offloaded to the thread pool from the start
+        """
+        assert blocking_threshold is None or blocking_threshold > 0, "blocking_threshold must be positive or None"
+        assert offload is None or all(isinstance(m, BaseModule) for m in offload), "offload must be a list of modules"
+        self._blocking_threshold = blocking_threshold
+        self._max_workers = max_workers
+        self._loop = None
+        self._loop_thread = None
+        self._loop_thread_id = None
+        self._executor = None
+        self._offloaded = set(offload) if offload is not None else set()
+
+    @property
+    def offloaded_modules(self) -> list:
+        """ Returns the modules that run on the thread pool, because they were passed as offload or blocked the loop. """
+        return list(self._offloaded)
+
+    @staticmethod
+    def _is_paced(source: BaseSource) -> bool:
+        return isinstance(source, BaseDiscreteSamplingSource)
+
+    def start(self, pipeline):
+        threaded = [n for n in pipeline.processor_nodes if n._parallelism > 1 or n.fused]
+        consumers = [n for n in pipeline.processor_nodes + pipeline.sink_nodes if n not in threaded]
+        sources = pipeline.source_nodes
+        on_loop = [n for n in pipeline.processor_nodes if n not in threaded or n.fused]
+        for module in consumers:
+            # frames sent from the event loop thread must not block it
+            loop_predecessors = [n for n in pipeline.graph.predecessors(module) if n in on_loop or self._is_paced(n)]
+            assert not (module._queue.may_block and len(loop_predecessors) > 0), \
+                f"{module.name} is fed by modules running on the event loop, so its queue must not use the " \
+                f"overflow policy 'block' with a capacity (use a drop policy instead)"
+
+        self._loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="msp-offload")
+        for module in threaded:
+            module.start()
+        for module in consumers:
+            module.start(threaded=False)
+        started = Event()
+        self._loop_thread = Thread(target=self._run, args=(consumers, sources, started), name="msp-asyncio")
+        self._loop_thread.start()
+        started.wait()
+
+    def _run(self, consumers: List[BaseSink], sources: List[BaseSource], started: Event):
+        self._loop_thread_id = get_ident()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main(consumers, sources, started))
+        finally:
+            self._loop.close()
+            self._executor.shutdown()
+
+    async def _main(self, consumers: List[BaseSink], sources: List[BaseSource], started: Event):
+        consumer_tasks = []
+        for module in consumers:
+            wakeup = asyncio.Event()
+            module._queue.set_listener(partial(self._wakeup, wakeup))
+            consumer_tasks.append(asyncio.ensure_future(self._consume(module, wakeup)))
+        # sources are started after all consumers can be woken up
+        source_tasks = []
+        for source in sources:
+            source.start(threaded=False)
+            source_tasks.append(asyncio.ensure_future(self._produce(source)))
+        started.set()
+
+        await asyncio.gather(*consumer_tasks)
+        for module in consumers:
+            module._queue.set_listener(None)
+        # e.g., a failed consumer: stopping the sources releases their devices, which wakes blocked on_update calls
+        for source in sources:
+            if source.active:
+                source.stop(blocking=False)
+        # sources that are still waiting in on_update can not be interrupted, their results are discarded
+        for task in source_tasks:
+            task.cancel()
+        await asyncio.gather(*source_tasks, return_exceptions=True)
+
+    def _wakeup(self, wakeup: asyncio.Event):
+        if wakeup.is_set():
+            return
+        if get_ident() == self._loop_thread_id:
+            wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(wakeup.set)
+
+    async def _call(self, module: BaseModule, func: Callable, *args):
+        """ Calls func on the event loop, or on the thread pool if the module is known to block. """
+        if module in self._offloaded:
+            await self._loop.run_in_executor(self._executor, func, *args)
+            return
+        if self._blocking_threshold is None:
+            func(*args)
+            return
+
+        t_start = time.perf_counter()
+        func(*args)
+        if time.perf_counter() - t_start > self._blocking_threshold:
+            logger.debug(f"[OFFLOAD] {module.uuid} blocks the event loop, it is offloaded to a thread pool")
+            self._offloaded.add(module)
+
+    async def _produce(self, source: BaseSource):
+        """ Sends the frames of a source until it stops (like BaseSource._worker). """
+        try:
+            if not self._is_paced(source):
+                done = self._loop.create_future()
+                Thread(target=self._run_source, args=(source, done), name=f"msp-source-{source.name}",
+                       daemon=True).start()
+                await done
+                return
+
+            t_next = time.perf_counter()
+            period_time = 1. / source.samplerate
+            while source.active:
+                await self._call(source, source._step)
+                t_next += period_time
+                await asyncio.sleep(max(0., t_next - time.perf_counter()))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"[WORKER FAILED] {source.uuid}")
+
+    def _run_source(self, source: BaseSource, done: asyncio.Future):
+        """ Sends the frames of a source that blocks in on_update, on its own thread. """
+        try:
+            while source.active:
+                source._step()
+        except Exception:
+            logger.exception(f"[WORKER FAILED] {source.uuid}")
+        finally:
+            try:
+                self._loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+            except RuntimeError:
+                pass  # the event loop was closed, i.e., the pipeline already ended
+
+    async def _consume(self, module: BaseSink, wakeup: asyncio.Event):
+        """ Handles the incoming frames of a module until it stops (like BaseSink._worker). """
+        queue = module._queue
+        batched = module._batch_size > 1
+        process = module._process_frame_batch if batched else module._process_frame
+        try:
+            while module.active:
+                try:
+                    if batched:
+                        item = queue.get_batch(module._batch_size, block=False)
+                    else:
+                        item = queue.get(block=False)
+                except Empty:
+                    await wakeup.wait()
+                    wakeup.clear()
+                    continue
+
+                await self._call(module, process, item)
+                await asyncio.sleep(0)  # let other modules handle their frames
+        except Exception:
+            logger.exception(f"[WORKER FAILED] {module.uuid}")
+
+    def join(self, pipeline):
+        if self._loop_thread is not None:
+            self._loop_thread.join()
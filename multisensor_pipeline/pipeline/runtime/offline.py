@@ -0,0 +1,100 @@
+from queue import Empty
+import heapq
+import logging
+
+import networkx as nx
+
+from multisensor_pipeline.dataframe import MSPDataFrame
+from multisensor_pipeline.modules.base import BaseSource, BaseSink
+from multisensor_pipeline.modules.persistence.dataset import BaseDatasetSource
+from .base import PipelineRuntime
+
+logger = logging.getLogger(__name__)
+
+
+class OfflineRuntime(PipelineRuntime):
+    """
+    Runs a pipeline synchronously in the calling thread, e.g., to reprocess recordings as fast as possible. start()
+    returns after all sources are exhausted and all modules stopped.
+
+    The sources are read in turns, such that their frames are sent in timestamp order (like a merged recording). Sinks
+    and processors are fused (see BaseSink.fuse), i.e., they handle frames inline when they are sent. Modules that
+    batch or drop frames keep their queue, which is processed in topological order after each frame. This way, a frame
+    passes the whole graph before the next one is read. There are no threads, no waiting for the playback speed of
+    dataset sources and the output does not depend on timing. All sources must be dataset sources, because a source is
+    exhausted when on_update returns None.
+    """
+
+    name = "offline"
+
+    def __init__(self):
+        self._queued = []
+
+    def start(self, pipeline):
+        for source in pipeline.source_nodes:
+            assert isinstance(source, BaseDatasetSource), \
+                f"{source.name} is not a dataset source, the offline runtime can only run finite sources"
+        consumers = [n for n in nx.topological_sort(pipeline.graph) if isinstance(n, BaseSink)]
+        for module in consumers:
+            # put would block forever, because no other thread takes frames from the queue
+            assert not module._queue.may_block, \
+                f"{module.name} uses the overflow policy 'block' with a capacity, this is not supported offline"
+            # all frames are sent from this thread, so they can be handled inline
+            if module.fusable and not module.fused:
+                module.fuse()
+        # modules that batch or drop frames keep their queue
+        self._queued = [m for m in consumers if not m.fused]
+
+        for module in consumers + pipeline.source_nodes:
+            module.start(threaded=False)
+
+        heads = []  # heap of (timestamp, source index, frame), the next frame of each source
+        for i, source in enumerate(pipeline.source_nodes):
+            self._read(source, i, heads)
+        while len(heads) > 0:
+            _, i, frame = heapq.heappop(heads)
+            source = pipeline.source_nodes[i]
+            self._send(source, frame)
+            self._read(source, i, heads)
+
+    def _read(self, source: BaseSource, index: int, heads: list):
+        """ Reads the next frame of a source, control messages are sent right away. """
+        while source.active:
+            frame = source.on_update()
+            if frame is None:
+                break
+            if not frame.topic.is_control_topic:
+                heapq.heappush(heads, (frame.timestamp, index, frame))
+                return
+            self._send(source, frame)
+
+        # the source is exhausted
+        if source.active:
+            source.stop(blocking=False)
+        self._process()
+
+    def _send(self, source: BaseSource, frame: MSPDataFrame):
+        # bypasses the playback speed and flow control of dataset sources
+        BaseSource._notify(source, frame)
+        self._process()
+
+    def _process(self):
+        """ Handles all queued frames, successors are handled after their predecessors. """
+        for module in self._queued:
+            queue = module._queue
+            batched = module._batch_size > 1
+            while module.active:
+                try:
+                    if batched:
+                        module._process_frame_batch(queue.get_batch(module._batch_size, block=False))
+                    else:
+                        module._process_frame(queue.get(block=False))
+                except Empty:
+                    break
+
+    def stop(self, pipeline):
+        """ The pipeline stopped already, when start returned. """
+        pass
+
+    def join(self, pipeline):
+        pass
@@ -0,0 +1,140 @@
+from functools import partial
+from queue import Queue, Empty
+from threading import Thread, Lock
+import logging
+
+from multisensor_pipeline.modules.base import BaseSink
+from .base import PipelineRuntime
+
+logger = logging.getLogger(__name__)
+
+
+class _ScheduledModule:
+    """ Scheduling state of a sink or processor: it is in the run queue at most once, i.e., handled by one worker. """
+
+    def __init__(self, module: BaseSink):
+        self.module = module
+        self.lock = Lock()
+        self.scheduled = False
+        self.finished = False
+
+
+class PoolRuntime(PipelineRuntime):
+    """
+    Runs the on_update calls of all processors and sinks on a fixed pool of worker threads. When frames arrive, the
+    module is put into a run queue, from which the workers take ready modules. A module is handled by one worker at a
+    time, such that its frames are processed serially and in order. Sources (which block while waiting for data) and
+    processors with parallelism > 1 keep their own threads, fused processors are handled by their predecessor.
+    """
+
+    name = "pool"
+
+    def __init__(self, num_workers: int = 4, quantum: int = 16):
+        """
+        Args:
+            num_workers: number of worker threads
+            quantum: max number of frames (or batches) a worker handles for a module before it takes the next module
+        """
+        assert num_workers >= 1, f"num_workers must be at least 1, but was {num_workers}"
+        self._num_workers = num_workers
+        self._quantum = quantum
+        self._run_queue = None
+        self._workers = []
+        self._lock = Lock()
+        self._num_unfinished = 0
+
+    def start(self, pipeline):
+        threaded = [n for n in pipeline.processor_nodes if n._parallelism > 1 or n.fused]
+        consumers = [n for n in pipeline.processor_nodes + pipeline.sink_nodes if n not in threaded]
+        on_pool = [n for n in pipeline.processor_nodes if n not in threaded or n.fused]
+        for module in consumers:
+            # a worker that blocks in put could wait for a module that needs a worker itself
+            pool_predecessors = [n for n in pipeline.graph.predecessors(module) if n in on_pool]
+            assert not (module._queue.may_block and len(pool_predecessors) > 0), \
+                f"{module.name} is fed by modules running on the worker pool, so its queue must not use the " \
+                f"overflow policy 'block' with a capacity (use a drop policy instead)"
+
+        # the state of a previous run must not leak into this one, e.g., stop markers that were not consumed
+        self._run_queue = Queue()
+        self._workers = []
+        self._num_unfinished = len(consumers)
+        for _ in range(self._num_workers):
+            worker = Thread(target=self._worker, name="msp-pool")
+            worker.start()
+            self._workers.append(worker)
+        for module in threaded:
+            module.start()
+        for module in consumers:
+            state = _ScheduledModule(module)
+            module._queue.set_listener(partial(self._schedule, state))
+            module.start(threaded=False)
+        for source in pipeline.source_nodes:
+            source.start()
+
+        if len(consumers) == 0:
+            self._stop_workers()
+
+    def _schedule(self, state: _ScheduledModule):
+        with state.lock:
+            if state.scheduled or state.finished:
+                return
+            state.scheduled = True
+        self._run_queue.put(state)
+
+    def _stop_workers(self):
+        for _ in self._workers:
+            self._run_queue.put(None)
+
+    def _finish(self, state: _ScheduledModule):
+        with state.lock:
+            state.finished = True
+        state.module._queue.set_listener(None)
+        with self._lock:
+            self._num_unfinished -= 1
+            if self._num_unfinished == 0:
+                self._stop_workers()
+
+    def _handle(self, state: _ScheduledModule) -> bool:
+        """ Handles up to quantum frames of the module, returns whether the module is finished. """
+        module = state.module
+        queue = module._queue
+        batched = module._batch_size > 1
+        process = module._process_frame_batch if batched else module._process_frame
+        for _ in range(self._quantum):
+            if not module.active:
+                return True
+            try:
+                item = queue.get_batch(module._batch_size, block=False) if batched else queue.get(block=False)
+            except Empty:
+                break
+            process(item)
+        return not module.active
+
+    def _worker(self):
+        while True:
+            state = self._run_queue.get()
+            if state is None:
+                return
+
+            try:
+                finished = self._handle(state)
+            except Exception:
+                logger.exception(f"[WORKER FAILED] {state.module.uuid}")
+                finished = True
+            if finished:
+                self._finish(state)
+                continue
+
+            with state.lock:
+                state.scheduled = False
+            # frames that arrived while the module was handled
+            if not state.module._queue.empty():
+                self._schedule(state)
+
+    def join(self, pipeline):
+        for worker in self._workers:
+            worker.join()
+
+    @property
+    def num_workers(self) -> int:
+        return self._num_workers
@@ -0,0 +1,32 @@
+from multisensor_pipeline.modules.base import BaseModule
+from .base import PipelineRuntime
+
+
+class ThreadRuntime(PipelineRuntime):
+    """ Runs each module in its own thread. This is the default runtime. """
+
+    name = "thread"
+
+    @staticmethod
+    def _has_inactive_successors(graph, node):
+        return any([not n.active for n in graph.successors(node)])
+
+    def _start_reversed(self, graph, node):
+        """ Starts nodes in a depth first search. """
+        if isinstance(node, BaseModule):
+            # start module (queues don't need to be started)
+            node.start()
+        for n in graph.predecessors(node):
+            if self._has_inactive_successors(graph, n):
+                continue  # will be started when coming from another sink node
+            if n.active:
+                continue
+            self._start_reversed(graph, n)
+
+    def start(self, pipeline):
+        for node in pipeline.sink_nodes:
+            self._start_reversed(pipeline.graph, node)
+
+    def join(self, pipeline):
+        for node in pipeline.sink_nodes:
+            node.join()
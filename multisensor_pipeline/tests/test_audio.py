@@ -1,9 +1,12 @@
+import gc
 import os
 import unittest
 from time import sleep
+from types import SimpleNamespace
 import pathlib
 
 import numpy as np
+import sounddevice as sd
 
 from multisensor_pipeline.dataframe import Topic
 from multisensor_pipeline.modules import ListSink
@@ -80,3 +83,36 @@ class AudioTest(unittest.TestCase):
         self.assertTrue(wav_file.is_file())
         # Cleanup
         os.remove(filename)
+
+    def test_mic_callback_mode(self):
+        mic = MicrophoneSource(callback=True, latency="low", buffer_blocks=8)
+        sink = ListSink()
+
+        pipeline = GraphPipeline()
+        pipeline.add_source(mic)
+        pipeline.add_sink(sink)
+        pipeline.connect(mic, sink)
+
+        pipeline.start()
+        sleep(1.)
+        pipeline.stop()
+        pipeline.join()
+        self.assertGreater(len(sink), 1)
+        self.assertEqual((mic._blocksize, mic.channels), sink.list[0].data.shape)
+        self.assertFalse(sink.list[0].data.flags.writeable)
+
+    def test_mic_callback_ring_buffer(self):
+        mic = MicrophoneSource(callback=True, blocksize=4, channels=1, buffer_blocks=2)
+        time_info = SimpleNamespace(inputBufferAdcTime=0.)
+        frames = []
+        for i in range(5):
+            mic._on_audio_block(np.full((4, 1), i, dtype=np.float32), 4, time_info, sd.CallbackFlags())
+            frames.append(mic.on_update())
+        # slots are not overwritten while the frames are kept, further blocks are copied
+        self.assertEqual(list(range(5)), [int(f.data[0, 0]) for f in frames])
+        self.assertEqual(0, len(mic._free_slots))
+
+        frames.clear()
+        gc.collect()
+        self.assertEqual(2, len(mic._free_slots))
+        mic._stream.close()
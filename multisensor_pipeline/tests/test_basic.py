@@ -5,14 +5,21 @@ from datetime import datetime
 import logging
 from typing import Optional, List
 from random import randint
+import threading
+from threading import Thread
 import numpy as np
 
-from multisensor_pipeline.dataframe.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe.dataframe import MSPDataFrame, Topic, MSPControlMessage
 from multisensor_pipeline.modules.base.base import BaseSource, BaseProcessor, BaseSink
+from multisensor_pipeline.modules.base.callback import BaseCallbackSource
+from multisensor_pipeline.modules.base.timer import PeriodicTimer, OverrunPolicy
+from multisensor_pipeline.modules.base.queues import FrameQueue, OverflowPolicy
+from multisensor_pipeline.modules.base.profiling import MSPModuleStats
 from multisensor_pipeline.modules.npy import RandomArraySource, ArrayManipulationProcessor
 from multisensor_pipeline.modules import QueueSink, ConsoleSink, SleepTrashSink, SleepPassthroughProcessor, ListSink, \
     PassthroughProcessor, TrashSink
 from multisensor_pipeline.pipeline.graph import GraphPipeline
+from multisensor_pipeline.pipeline.runtime import AsyncioRuntime, PoolRuntime
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -67,6 +74,22 @@ class ConstraintCheckingProcessor(BaseProcessor):
         return [Topic(name='constraint_check', dtype=bool)]
 
 
+class CallbackIntSource(BaseCallbackSource):
+    """Hands over 10 integer numbers from a foreign thread."""
+
+    def on_start(self):
+        Thread(target=self._callback_thread).start()
+
+    def _callback_thread(self):
+        for i in range(10):
+            self.put_frame(MSPDataFrame(topic=self.output_topics[0], data=i))
+            sleep(.01)
+
+    @property
+    def output_topics(self) -> Optional[List[Topic]]:
+        return [Topic(name='callback', dtype=int)]
+
+
 class BaseTestCase(unittest.TestCase):
     def test_pipeline_example(self):
         pipeline = GraphPipeline()
@@ -272,6 +295,35 @@ class BaseTestCase(unittest.TestCase):
         self.assertEqual(sleep_trash_sink.counter, 10)
         self.assertEqual((end_time - start_time).seconds, 5)
 
+    def test_routing_without_duplicates(self):
+        source = RandomArraySource(samplerate=100, max_count=10)
+        sink = ListSink()
+
+        # the sink is registered for two topics that both match the emitted frames
+        pipeline = GraphPipeline()
+        pipeline.add(modules=[source, sink])
+        pipeline.connect(module=source, successor=sink, topics=[Topic(dtype=int), Topic(name="random", dtype=int)])
+
+        with pipeline:
+            sleep(.5)
+        self.assertEqual(len(sink), 10)
+
+    def test_custom_observer(self):
+        source = RandomArraySource(samplerate=100, max_count=10)
+        frames = []
+
+        class _Observer:
+            def put(self, frame: MSPDataFrame):
+                frames.append(frame)
+
+        # any object that implements put can observe a source
+        source.add_observer(_Observer())
+        self.assertRaises(AssertionError, source.add_observer, object())
+        source.start()
+        sleep(.3)
+        source.stop()
+        self.assertEqual(10, len([f for f in frames if not isinstance(f, MSPControlMessage)]))
+
     def test_dropout_simple(self):
         samplerate = 100
         max_age = .05
@@ -294,6 +346,270 @@ class BaseTestCase(unittest.TestCase):
         self.assertAlmostEqual(processor.stats.frame_skip_rate, samplerate - 1./simulated_processing_time, delta=1)
         self.assertEqual(sink.stats.frame_skip_rate, 0.)
 
+    def test_overflow_policies(self):
+        topic_a, topic_b = Topic(name="a", dtype=int), Topic(name="b", dtype=int)
+        eos = MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM)
+
+        def _fill(overflow, topics):
+            queue = FrameQueue(capacity=3, overflow=overflow)
+            frames = [MSPDataFrame(topic=topics[i % len(topics)], data=i, timestamp=i) for i in range(5)]
+            num_dropped = sum(queue.put(f)[1] for f in frames)
+            queue.put(eos)
+            return [queue.get().data for _ in range(queue.qsize())], num_dropped
+
+        self.assertEqual(([2, 3, 4, eos.data], 2), _fill(OverflowPolicy.DROP_OLDEST, [topic_a]))
+        self.assertEqual(([0, 1, 2, eos.data], 2), _fill(OverflowPolicy.DROP_NEWEST, [topic_a]))
+        self.assertEqual(([3, 4, eos.data], 3), _fill(OverflowPolicy.LATEST, [topic_a, topic_b]))
+
+    def test_topic_queues(self):
+        video, gaze = Topic(name="video", dtype=int), Topic(name="gaze", dtype=int)
+        queue = FrameQueue(dropout=.5, topic_queues={video: {"capacity": 1, "overflow": OverflowPolicy.LATEST}})
+
+        # frames of each topic arrive in bursts, but are returned in timestamp order
+        for t in [0., .1, .2, .3]:
+            queue.put(MSPDataFrame(topic=gaze, data=t, timestamp=t))
+        queue.put(MSPDataFrame(topic=video, data=-1., timestamp=-1.))
+        # dropout only affects frames of the same topic, the video topic keeps only the latest frame
+        self.assertEqual((1, 0), queue.put(MSPDataFrame(topic=video, data=.15, timestamp=.15)))
+        queue.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+        self.assertEqual((0, 1), queue.put(MSPDataFrame(topic=video, data=.25, timestamp=.25)))
+        self.assertEqual((1, 0), queue.put(MSPDataFrame(topic=gaze, data=.6, timestamp=.6)))
+
+        result = [queue.get().data for _ in range(queue.qsize())]
+        self.assertEqual([.1, .2, .25, .3, MSPControlMessage.END_OF_STREAM, .6], result)
+
+    def test_batch_processing(self):
+
+        class BatchSizeProcessor(BaseProcessor):
+
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs)
+                self.batch_sizes = []
+
+            def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+                return frame
+
+            def on_update_batch(self, frames: List[MSPDataFrame]) -> List[Optional[MSPDataFrame]]:
+                self.batch_sizes.append(len(frames))
+                return frames
+
+        topic = Topic(name="random", dtype=int)
+        processor = BatchSizeProcessor(batch_size=4, batch_timeout=.1)
+        sink = ListSink()
+        processor.add_observer(sink)
+        for i in range(10):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+
+        sink.start()
+        processor.start()
+        processor.join()
+        sink.join()
+        self.assertEqual([4, 4, 2], processor.batch_sizes)
+        self.assertEqual(list(range(10)), [f.data for f in sink.list])
+
+    def test_parallel_processing(self):
+        topic = Topic(name="random", dtype=int)
+        processor = SleepPassthroughProcessor(sleep_time=.05, parallelism=4, max_in_flight=6)
+        sink = ListSink()
+        processor.add_observer(sink)
+        for i in range(20):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+
+        start_time = time.perf_counter()
+        sink.start()
+        processor.start()
+        processor.join()
+        sink.join()
+        self.assertLess(time.perf_counter() - start_time, 20 * .05 / 2)
+        self.assertEqual(list(range(20)), [f.data for f in sink.list])
+
+        with self.assertRaises(AssertionError):
+            ConstraintCheckingProcessor(parallelism=2)
+        with self.assertRaises(AssertionError):
+            ArrayManipulationProcessor(np.sum, parallelism=2)
+
+    def test_parallel_processing_failure(self):
+        topic = Topic(dtype=int)
+        # fails for the frame 5, like the sequential worker, the parallel worker raises the exception and ends
+        processor = ArrayManipulationProcessor(lambda x: 10 // (x - 5), stateless=True, parallelism=2)
+        sink = ListSink()
+        processor.add_observer(sink)
+        for i in range(10):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+
+        sink.start()
+        processor.start()
+        processor.join()
+        eos = MSPControlMessage(message=MSPControlMessage.END_OF_STREAM)
+        eos.source_uuid = processor.uuid  # the processor ended without sending it
+        sink.put(eos)
+        sink.join()
+        self.assertEqual([10 // (i - 5) for i in range(5)], [f.data for f in sink.list])
+
+    def test_asyncio_runtime(self):
+        source = RandomArraySource(samplerate=200, max_count=50)
+        processors = [PassthroughProcessor() for _ in range(10)]
+        slow_processor = SleepPassthroughProcessor(sleep_time=.01)
+        sink = ListSink()
+
+        pipeline = GraphPipeline(runtime=AsyncioRuntime(blocking_threshold=.005))
+        pipeline.add([source, slow_processor, sink] + processors)
+        last_module = source
+        for p in processors + [slow_processor]:
+            pipeline.connect(last_module, p)
+            last_module = p
+        pipeline.connect(last_module, sink)
+
+        with pipeline:
+            sleep(1.)
+        self.assertEqual(50, len(sink))
+        self.assertIn(slow_processor, pipeline.runtime.offloaded_modules)
+        self.assertFalse(any([p in pipeline.runtime.offloaded_modules for p in processors]))
+        self.assertFalse(any([m.active for m in pipeline.nodes]))
+
+    def test_asyncio_runtime_offload(self):
+        source = TimestampSource()  # not paced, it runs on its own thread
+        processor = SleepPassthroughProcessor(sleep_time=.01)
+        sink = ListSink()
+        runtime = AsyncioRuntime(blocking_threshold=None, offload=[processor])
+        pipeline = GraphPipeline(runtime=runtime)
+        pipeline.add([source, processor, sink])
+        pipeline.connect(source, processor)
+        pipeline.connect(processor, sink)
+
+        pipeline.start()
+        sleep(.5)
+        source_threads = [t for t in threading.enumerate() if t.name.startswith("msp-source")]
+        pipeline.stop()
+        pipeline.join()
+        self.assertEqual([processor], runtime.offloaded_modules)
+        self.assertGreater(len(sink), 0)
+        # a source that never returns from on_update must not keep the interpreter alive
+        self.assertTrue(len(source_threads) == 1 and source_threads[0].daemon)
+
+    def test_callback_source(self):
+        source = CallbackIntSource(timeout=10.)
+        sink = ListSink()
+        pipeline = GraphPipeline()
+        pipeline.add([source, sink])
+        pipeline.connect(source, sink)
+
+        pipeline.start()
+        sleep(.3)
+        t_start = time.perf_counter()
+        pipeline.stop()
+        pipeline.join()
+        # the waiting worker is woken up by stop, it does not wait for the timeout
+        self.assertLess(time.perf_counter() - t_start, 1.)
+        self.assertEqual(list(range(10)), [f.data for f in sink.list])
+
+    def test_timer_overrun_policies(self):
+        def next_deadline(overrun):
+            timer = PeriodicTimer(callback=lambda: None, period=.01, overrun=overrun, deadline=0.)
+            return timer._next_deadline(t_end=.035), timer.stats
+
+        deadline, stats = next_deadline(OverrunPolicy.SKIP)
+        self.assertAlmostEqual(.04, deadline)
+        self.assertEqual((1, 3), (stats.overruns, stats.missed_ticks))
+        self.assertAlmostEqual(.01, next_deadline(OverrunPolicy.BURST)[0])
+        self.assertAlmostEqual(.035, next_deadline(OverrunPolicy.REPHASE)[0])
+
+    def test_shared_timer_service(self):
+        sources = [RandomArraySource(samplerate=100, max_count=20) for _ in range(5)]
+        sink = ListSink()
+        pipeline = GraphPipeline()
+        pipeline.add(sources + [sink])
+        for source in sources:
+            pipeline.connect(source, sink)
+
+        with pipeline:
+            sleep(.5)
+        self.assertEqual(100, len(sink))
+        for source in sources:
+            self.assertGreaterEqual(source.timer_stats.ticks, 20)
+            self.assertLess(source.timer_stats.mean_jitter, .005)
+
+        # a full queue would stall the shared timer thread
+        source = RandomArraySource(samplerate=100)
+        source.add_observer(SleepTrashSink(sleep_time=.01, capacity=1))
+        self.assertRaises(AssertionError, source.start)
+        self.assertFalse(source.active)
+
+    def test_pool_runtime(self):
+        source = RandomArraySource(samplerate=500, max_count=100)
+        branches = [[PassthroughProcessor() for _ in range(10)] for _ in range(2)]
+        sinks = [ListSink() for _ in branches]
+
+        pipeline = GraphPipeline(runtime=PoolRuntime(num_workers=2))
+        pipeline.add([source] + sinks)
+        for processors, sink in zip(branches, sinks):
+            pipeline.add(processors)
+            last_module = source
+            for p in processors:
+                pipeline.connect(last_module, p)
+                last_module = p
+            pipeline.connect(last_module, sink)
+
+        with pipeline:
+            sleep(.5)
+        for sink in sinks:
+            self.assertEqual(100, len(sink))
+            timestamps = [f.timestamp for f in sink.list]
+            self.assertEqual(sorted(timestamps), timestamps)
+        self.assertFalse(any([m.active for m in pipeline.nodes]))
+
+        # the runtime can drive another pipeline
+        source, sink = RandomArraySource(samplerate=500, max_count=50), ListSink()
+        pipeline = GraphPipeline(runtime=pipeline.runtime)
+        pipeline.add([source, sink])
+        pipeline.connect(source, sink)
+        with pipeline:
+            sleep(.3)
+        self.assertEqual(50, len(sink))
+        self.assertFalse(any([m.active for m in pipeline.nodes]))
+
+    def test_processor_fusion(self):
+        source = RandomArraySource(samplerate=100, max_count=20)
+        processors = [PassthroughProcessor() for _ in range(5)]
+        sink = ListSink()
+
+        pipeline = GraphPipeline(profiling=True, fuse=True)
+        pipeline.add([source, sink] + processors)
+        last_module = source
+        for p in processors:
+            pipeline.connect(last_module, p)
+            last_module = p
+        pipeline.connect(last_module, sink)
+
+        with pipeline:
+            sleep(.5)
+        self.assertEqual(20, len(sink))
+        self.assertFalse(processors[0].fused)
+        self.assertTrue(all([p.fused for p in processors[1:]]))
+        self.assertFalse(any([m.active for m in pipeline.nodes]))
+        # fused processors are still profiled
+        self.assertEqual(1, len(processors[-1].stats.get_stats(MSPModuleStats.Direction.IN)))
+
+    def test_bounded_queue(self):
+        samplerate = 100
+        runtime = .5
+
+        source = RandomArraySource(samplerate=samplerate, max_count=samplerate)
+        sink = SleepTrashSink(sleep_time=.1, capacity=2, overflow=OverflowPolicy.DROP_OLDEST)
+        pipeline = GraphPipeline(profiling=True)
+        pipeline.add([source, sink])
+        pipeline.connect(source, sink)
+
+        with pipeline:
+            sleep(runtime)
+
+        self.assertLessEqual(sink.stats.average_queue_size, 2)
+        self.assertGreater(sink.stats.dropped_frames, 0)
+        self.assertEqual(sink.stats.skipped_frames, 0)
+
     def _run_latency_pipeline(self, n=10):
         source = TimestampSource()
         sink = DelayMeasurementSink()
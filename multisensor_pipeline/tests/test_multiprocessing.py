@@ -1,20 +1,61 @@
+import os
 import time
 import logging
 import unittest
+from typing import Optional, List
 
 import numpy as np
 
+from PIL import Image
+
+from multisensor_pipeline.modules.base import SharedMemoryQueue, Transport
 from multisensor_pipeline.modules.multiprocess import MultiprocessSourceWrapper, MultiprocessSinkWrapper, \
-    MultiprocessProcessorWrapper
+    MultiprocessProcessorWrapper, MultiprocessPoolProcessorWrapper, Scheduling, StartMethod
 from multisensor_pipeline.modules.npy import RandomArraySource, ArrayManipulationProcessor
-from multisensor_pipeline.modules import PassthroughProcessor, QueueSink, ConsoleSink, ListSink
+from multisensor_pipeline.modules import PassthroughProcessor, QueueSink, ConsoleSink, ListSink, \
+    SleepPassthroughProcessor
+from multisensor_pipeline.modules.base import BaseProcessor, MSPModuleStats
 from multisensor_pipeline.pipeline.graph import GraphPipeline
-from multisensor_pipeline.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe import MSPDataFrame, Topic, MSPControlMessage
 import multiprocessing as mp
 
 logging.basicConfig(level=logging.DEBUG)
 
 
+class EvenDuplicateProcessor(BaseProcessor):
+    """ Drops odd numbers and sends even numbers twice. """
+
+    stateless = True
+
+    def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+        time.sleep(.002 * (frame.data % 3))  # frames finish out of order in a pool
+        if frame.data % 2 == 1:
+            return None
+        self._notify(MSPDataFrame(topic=frame.topic, timestamp=frame.timestamp, data=frame.data))
+        return MSPDataFrame(topic=frame.topic, timestamp=frame.timestamp, data=frame.data)
+
+
+class ExitProcessor(BaseProcessor):
+    """ Ends its process when it receives 3. """
+
+    stateless = True
+
+    def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+        if frame.data == 3:
+            os._exit(1)
+        return frame
+
+
+class BatchSumProcessor(BaseProcessor):
+    """ Sends the sum of each batch. """
+
+    def on_update(self, frame: MSPDataFrame) -> Optional[MSPDataFrame]:
+        return frame
+
+    def on_update_batch(self, frames: List[MSPDataFrame]) -> List[MSPDataFrame]:
+        return [MSPDataFrame(topic=frames[-1].topic, timestamp=frames[-1].timestamp, data=sum([f.data for f in frames]))]
+
+
 class MultiprocessingTestCase(unittest.TestCase):
 
     @staticmethod
@@ -36,6 +77,41 @@ class MultiprocessingTestCase(unittest.TestCase):
         process.join()
         self.assertEqual(df_in.data, df_out.data)
 
+    @staticmethod
+    def _echo_worker(queue_in: SharedMemoryQueue, queue_out: SharedMemoryQueue, num_frames: int):
+        for _ in range(num_frames):
+            queue_out.put(queue_in.get())
+
+    def test_shared_memory_queue(self):
+        array = np.random.rand(256, 256)
+        image = Image.fromarray(np.random.randint(0, 255, (128, 128, 3), dtype=np.uint8))
+        frames_in = [
+            MSPDataFrame(data=array, topic=Topic(dtype=np.ndarray)),
+            MSPDataFrame(data=image, topic=Topic(dtype=Image.Image)),
+            MSPDataFrame(data=np.arange(3), topic=Topic(dtype=np.ndarray)),  # small payloads are pickled
+        ]
+
+        queue_in = SharedMemoryQueue(num_slots=2, slot_size=1 << 20)
+        queue_out = SharedMemoryQueue(num_slots=2, slot_size=1 << 20)
+        process = mp.Process(target=MultiprocessingTestCase._echo_worker,
+                             args=(queue_in, queue_out, len(frames_in)))
+        process.start()
+        for frame in frames_in:
+            queue_in.put(frame)
+        frames_out = [queue_out.get() for _ in frames_in]
+        process.join()
+
+        np.testing.assert_array_equal(frames_out[0].data, array)
+        self.assertFalse(frames_out[0].data.flags.writeable)
+        np.testing.assert_array_equal(np.asarray(frames_out[1].data), np.asarray(image))
+        np.testing.assert_array_equal(frames_out[2].data, np.arange(3))
+        # the slot of the array is in use until the array was garbage collected
+        self.assertEqual(sum(queue_out._in_use), 1)
+        del frames_out
+        self.assertEqual(sum(queue_out._in_use), 0)
+        queue_in.close()
+        queue_out.close()
+
     def test_source_wrapper(self):
         # create nodes
         source = MultiprocessSourceWrapper(
@@ -132,6 +208,156 @@ class MultiprocessingTestCase(unittest.TestCase):
 
         self.assertFalse(queue.empty())
 
+    def test_processor_wrapper_shared_memory(self):
+        source = MultiprocessSourceWrapper(
+            module_cls=RandomArraySource,
+            shape=(240, 320, 3),
+            samplerate=50,
+            transport=Transport.SHARED_MEMORY,
+        )
+        processor = MultiprocessProcessorWrapper(
+            module_cls=PassthroughProcessor,
+            transport=Transport.SHARED_MEMORY,
+            transport_args={"num_slots": 4},
+        )
+        sink = QueueSink()
+
+        source.add_observer(processor)
+        processor.add_observer(sink)
+
+        sink.start()
+        processor.start()
+        source.start()
+
+        time.sleep(.5)
+
+        source.stop()
+        sink.join()
+
+        self.assertFalse(sink.queue.empty())
+        frame = sink.queue.get()
+        self.assertEqual(frame.data.shape, (240, 320, 3))
+
+    def test_processor_wrapper_in_flight(self):
+        processor = MultiprocessProcessorWrapper(module_cls=EvenDuplicateProcessor, in_flight_window=4)
+        sink = ListSink()
+        processor.add_observer(sink)
+
+        sink.start()
+        processor.start()
+        topic = Topic(dtype=int)
+        for i in range(10):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+        sink.join()
+
+        # all frames in flight are sent before the wrapper stops
+        self.assertEqual([f.data for f in sink.list], [0, 0, 2, 2, 4, 4, 6, 6, 8, 8])
+        self.assertFalse(processor._process.is_alive())
+
+    def test_processor_wrapper_batching(self):
+        # the batching processor is not fused, its frames are in flight until they were processed
+        processor = MultiprocessProcessorWrapper(module_cls=BatchSumProcessor, in_flight_window=2, batch_size=4)
+        sink = ListSink()
+        processor.add_observer(sink)
+
+        sink.start()
+        processor.start()
+        topic = Topic(dtype=int)
+        for i in range(10):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+        sink.join()
+
+        self.assertEqual(sum(range(10)), sum([f.data for f in sink.list]))
+        self.assertFalse(processor._process.is_alive())
+        self.assertRaises(AssertionError, MultiprocessProcessorWrapper, module_cls=EvenDuplicateProcessor,
+                          parallelism=2)
+
+    def test_pool_processor_wrapper(self):
+        for scheduling in Scheduling.ALL:
+            processor = MultiprocessPoolProcessorWrapper(module_cls=EvenDuplicateProcessor, workers=3,
+                                                         scheduling=scheduling)
+            sink = ListSink()
+            processor.add_observer(sink)
+
+            sink.start()
+            processor.start()
+            topic = Topic(dtype=int)
+            for i in range(30):
+                processor.put(MSPDataFrame(topic=topic, data=i))
+            processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+            sink.join()
+
+            # outputs are merged in input order
+            self.assertEqual([f.data for f in sink.list], [i for i in range(0, 30, 2) for _ in range(2)])
+            self.assertFalse(any([w.process.is_alive() for w in processor._workers]))
+
+    def test_pool_processor_wrapper_failed_worker(self):
+        for scheduling in Scheduling.ALL:
+            processor = MultiprocessPoolProcessorWrapper(module_cls=ExitProcessor, workers=2, scheduling=scheduling,
+                                                         in_flight_window=2)
+            sink = ListSink()
+            processor.add_observer(sink)
+
+            sink.start()
+            processor.start()
+            topic = Topic(dtype=int)
+            for i in range(20):
+                processor.put(MSPDataFrame(topic=topic, data=i))
+            processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+            sink.join()
+
+            # the frames in flight of the failed worker are dropped, the other worker takes over
+            data = [f.data for f in sink.list]
+            self.assertNotIn(3, data)
+            self.assertEqual(sorted(data), data)
+            self.assertGreaterEqual(len(data), 20 - 2)
+            self.assertEqual([False, True], sorted([w.failed for w in processor._workers]))
+
+    def test_start_methods(self):
+        self.assertRaises(AssertionError, MultiprocessProcessorWrapper, module_cls=PassthroughProcessor,
+                          start_method="unknown")
+        for start_method in [StartMethod.FORKSERVER, StartMethod.SPAWN]:
+            with self.subTest(start_method=start_method):
+                if start_method not in mp.get_all_start_methods():
+                    self.skipTest(f"start method '{start_method}' is not available on this platform")
+                processor = MultiprocessProcessorWrapper(module_cls=PassthroughProcessor, start_method=start_method,
+                                                         transport=Transport.SHARED_MEMORY)
+                sink = ListSink()
+                processor.add_observer(sink)
+
+                sink.start()
+                processor.start()
+                array = np.random.rand(128, 128)
+                processor.put(MSPDataFrame(topic=Topic(dtype=np.ndarray), data=array))
+                processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+                sink.join()
+
+                self.assertEqual(len(sink), 1)
+                np.testing.assert_array_equal(sink.list[0].data, array)
+
+    def test_wrapped_module_stats(self):
+        processor = MultiprocessProcessorWrapper(module_cls=SleepPassthroughProcessor, sleep_time=.01,
+                                                 stats_interval=.1)
+        processor.profiling = True
+        sink = ListSink()
+        processor.add_observer(sink)
+
+        sink.start()
+        processor.start()
+        topic = Topic(dtype=int)
+        for i in range(10):
+            processor.put(MSPDataFrame(topic=topic, data=i))
+        processor.put(MSPControlMessage(message=MSPControlMessage.END_OF_STREAM))
+        sink.join()
+
+        # the stats of the wrapped processor were reported by the child process
+        self.assertIsNot(processor.stats, processor.wrapper_stats)
+        self.assertIn(topic.uuid, processor.stats.get_stats(MSPModuleStats.Direction.IN))
+        self.assertIn(topic.uuid, processor.stats.get_stats(MSPModuleStats.Direction.OUT))
+        self.assertGreaterEqual(processor.stats.average_update_time, .01)
+
     def test_parallelized_pipeline(self):
         # create modules
         source = MultiprocessSourceWrapper(
@@ -3,12 +3,15 @@ import unittest
 import numpy as np
 from multisensor_pipeline.modules.persistence.recording import DefaultRecordingSink
 from multisensor_pipeline.modules.persistence.replay import DefaultReplaySource
+from multisensor_pipeline.modules.persistence.dataset import PlaybackClock
+from multisensor_pipeline.modules.base.timer import TimerStats
 from multisensor_pipeline.modules import ListSink, BaseSink
 from multisensor_pipeline.pipeline.graph import GraphPipeline
-from multisensor_pipeline.modules.npy import RandomArraySource
+from multisensor_pipeline.modules.npy import RandomArraySource, ArrayManipulationProcessor
 from time import sleep, perf_counter
 from PIL import Image
-from multisensor_pipeline.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe import MSPDataFrame, MSPControlMessage, Topic, JpegImageCodec, PngImageCodec, \
+    PassthroughImageCodec
 import io
 import logging
 
@@ -37,6 +40,173 @@ class DefaultSerializationTest(unittest.TestCase):
         imgs_are_equal = (np.asarray(img1) == np.asarray(img2)).all()
         self.assertTrue(imgs_are_equal)
 
+    def test_lossless_image_codecs(self):
+        img_raw = Image.fromarray(np.random.randint(0, 255, size=(100, 100, 3), dtype=np.uint8), mode="RGB")
+        frame = MSPDataFrame(data=img_raw, topic=Topic(name="image", dtype=Image.Image))
+        for codec in ["raw", "png", PngImageCodec(compress_level=9)]:
+            img = MSPDataFrame.deserialize(frame.serialize(image_codec=codec)).data
+            self.assertEqual(img_raw.size, img.size)
+            self.assertTrue((np.asarray(img_raw) == np.asarray(img)).all())
+
+    def test_passthrough_image_codec(self):
+        img_raw = Image.fromarray(np.random.randint(0, 255, size=(100, 100, 3), dtype=np.uint8), mode="RGB")
+        frame = MSPDataFrame(data=img_raw, topic=Topic(name="image", dtype=Image.Image))
+        packed = frame.serialize(image_codec=JpegImageCodec(quality=50))
+
+        # a received jpeg image is forwarded without re-encoding it
+        received = MSPDataFrame.deserialize(packed)
+        self.assertEqual(packed, received.serialize(image_codec="passthrough"))
+        self.assertNotEqual(packed, received.serialize(image_codec=JpegImageCodec(quality=95)))
+
+        # images without encoded bytes are encoded using the fallback codec
+        codec = PassthroughImageCodec(fallback="png")
+        img = MSPDataFrame.deserialize(frame.serialize(image_codec=codec)).data
+        self.assertEqual("PNG", img.format)
+
+    def test_serialization_cache(self):
+        frame = MSPDataFrame(data=np.random.rand(10), topic=Topic(name="array", dtype=np.ndarray))
+        packed = frame.serialize()
+        self.assertIs(packed, frame.serialize())
+        self.assertIs(packed, frame.serialize(image_codec=JpegImageCodec(quality=90)))
+        self.assertIsNot(packed, frame.serialize(image_codec="png"))
+
+        # reassigning attributes invalidates the cache
+        frame.data = np.random.rand(10)
+        self.assertNotEqual(packed, frame.serialize())
+        packed = frame.serialize()
+        frame.timestamp = frame.timestamp + 1.
+        self.assertNotEqual(packed, frame.serialize())
+        packed = frame.serialize()
+        frame.topic = Topic(name="other", dtype=np.ndarray)
+        self.assertNotEqual(packed, frame.serialize())
+
+    def test_ndarray_serialization(self):
+        arrays = [
+            np.random.rand(64, 256).astype(np.float32),
+            np.arange(12, dtype=">i4").reshape((3, 4)),  # non-native byte order
+            np.asfortranarray(np.random.rand(3, 5)),  # non-contiguous layout
+            np.zeros(shape=(0, 3)),
+            np.array([(1.5, 2), (3., 4)], dtype=[("x", "<f4"), ("y", "<i2")]),  # structured array
+            np.zeros(2, dtype=[("pos", "<f8", (2,)), ("meta", [("id", "<i4"), ("flag", "?")])]),
+            np.array([1, "a", None], dtype=object),  # falls back to list encoding
+        ]
+        for array in arrays:
+            frame = MSPDataFrame(data=array, topic=Topic(name="array", dtype=np.ndarray))
+            unpacked = MSPDataFrame.deserialize(frame.serialize()).data
+            self.assertEqual(array.dtype, unpacked.dtype)
+            self.assertEqual(array.dtype.names, unpacked.dtype.names)
+            self.assertEqual(array.shape, unpacked.shape)
+            self.assertTrue((array == unpacked).all())
+
+    def test_legacy_ndarray_deserialization(self):
+        import msgpack
+        packed = msgpack.packb({
+            "__ndarray__": True,
+            "data": [[1, 2], [3, 4]],
+            "shape": [2, 2],
+            "dtype": "int64"
+        })
+        array = MSPDataFrame.deserialize(packed)
+        self.assertEqual((2, 2), array.shape)
+        self.assertTrue((np.array([[1, 2], [3, 4]]) == array).all())
+
+    def test_batched_recording(self):
+        topic = Topic(name="array", dtype=np.ndarray)
+        frames = [MSPDataFrame(data=np.random.rand(5), topic=topic, timestamp=float(i)) for i in range(10)]
+
+        # frames are queued before the sink starts, such that they are written in batches
+        rec_sink = DefaultRecordingSink(self.filename, override=True, batch_size=4)
+        for frame in frames:
+            rec_sink.put(frame)
+        rec_sink.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+        rec_sink.start()
+        rec_sink.join()
+
+        replay_source = DefaultReplaySource(file_path=self.filename, playback_speed=float("inf"))
+        replay_list = ListSink()
+        replay_pipeline = GraphPipeline()
+        replay_pipeline.add([replay_source, replay_list])
+        replay_pipeline.connect(replay_source, replay_list)
+        replay_pipeline.start()
+        replay_pipeline.join()
+
+        self.assertEqual([f.timestamp for f in frames], [f.timestamp for f in replay_list.list])
+        self.assertTrue(all([(f1.data == f2.data).all() for f1, f2 in zip(frames, replay_list.list)]))
+
+    def test_replay_flow_control(self):
+        class QueueSizeSink(BaseSink):
+
+            def __init__(self):
+                super(QueueSizeSink, self).__init__()
+                self.frames = []
+                self.queue_sizes = []
+
+            def on_update(self, frame: MSPDataFrame):
+                self.queue_sizes.append(self._queue.qsize())
+                self.frames.append(frame)
+                sleep(.001)
+
+        topic = Topic(name="array", dtype=np.ndarray)
+        rec_sink = DefaultRecordingSink(self.filename, override=True)
+        for i in range(200):
+            rec_sink.put(MSPDataFrame(data=np.random.rand(5), topic=topic, timestamp=float(i)))
+        rec_sink.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+        rec_sink.start()
+        rec_sink.join()
+
+        replay_source = DefaultReplaySource(file_path=self.filename, high_watermark=10, low_watermark=2)
+        sink = QueueSizeSink()
+        pipeline = GraphPipeline()
+        pipeline.add([replay_source, sink])
+        pipeline.connect(replay_source, sink)
+        pipeline.start()
+        pipeline.join()
+
+        # no frame was dropped, but the queue did not grow beyond the high watermark
+        self.assertEqual([float(i) for i in range(200)], [f.timestamp for f in sink.frames])
+        # (the source checks the queue before it sends a frame, END_OF_STREAM is queued as well)
+        self.assertLessEqual(max(sink.queue_sizes), 12)
+
+    def _record(self, filename: str, timestamps: list):
+        topic = Topic(name="array", dtype=np.ndarray)
+        rec_sink = DefaultRecordingSink(filename, override=True)
+        frames = [MSPDataFrame(data=np.random.rand(5), topic=topic, timestamp=t) for t in timestamps]
+        for frame in frames:
+            rec_sink.put(frame)
+        rec_sink.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+        rec_sink.start()
+        rec_sink.join()
+        return frames
+
+    def test_offline_replay(self):
+        filename_odd = "odd_" + self.filename
+        frames = self._record(self.filename, [float(i) for i in range(0, 100, 2)])
+        frames += self._record(filename_odd, [float(i) for i in range(1, 100, 2)])
+        expected_sums = [np.sum(f.data) for f in sorted(frames, key=lambda f: f.timestamp)]
+
+        def run():
+            # replaying at 1x would take 100s in real-time
+            sources = [DefaultReplaySource(file_path=f, playback_speed=1.) for f in [self.filename, filename_odd]]
+            processor = ArrayManipulationProcessor(np.sum)
+            sink = ListSink()
+            pipeline = GraphPipeline(runtime="offline")
+            pipeline.add(sources + [processor, sink])
+            for source in sources:
+                pipeline.connect(source, processor)
+            pipeline.connect(processor, sink)
+            with pipeline:
+                pass
+            self.assertFalse(any([m.active for m in pipeline.nodes]))
+            return sink.list
+
+        t_start = perf_counter()
+        sums = [f.data for f in run()]
+        self.assertLess(perf_counter() - t_start, 5.)
+        # frames of both recordings are processed in timestamp order, the output is the same in each run
+        self.assertEqual(expected_sums, sums)
+        self.assertEqual(sums, [f.data for f in run()])
+        os.remove(filename_odd)
+
     def test_record_and_replay(self):
 
         class FrameTimeSink(BaseSink):
@@ -107,6 +277,51 @@ class DefaultSerializationTest(unittest.TestCase):
             f"Playback ({playback_speed}x) at {playback_fps} Hz"
         )
         self.assertAlmostEqual(rec_fps * playback_speed, playback_fps, delta=.05*rec_fps)
+        self.assertLess(replay_source.playback_stats.mean_jitter, .001)
+
+    def test_playback_clock(self):
+        clock = PlaybackClock(playback_speed=2.)
+        stats = TimerStats()
+        t_start = perf_counter()
+        self.assertTrue(clock.wait(timestamp=10., stats=stats))  # anchor, played immediately
+        self.assertTrue(clock.wait(timestamp=10.1, stats=stats))
+        self.assertAlmostEqual(.05, perf_counter() - t_start, delta=.005)
+        sleep(.1)
+        # the frame is .05s late
+        self.assertFalse(clock.wait(timestamp=10.2, max_lateness=.01, stats=stats))
+        self.assertTrue(clock.wait(timestamp=10.3, max_lateness=.01, stats=stats))
+        self.assertEqual(1, stats.overruns)
+        self.assertEqual(3, stats.ticks)
+
+    def test_shared_playback_clock(self):
+        topic = Topic(name="array", dtype=np.ndarray)
+        rec_sink = DefaultRecordingSink(self.filename, override=True)
+        for i in range(30):
+            rec_sink.put(MSPDataFrame(data=np.random.rand(5), topic=topic, timestamp=i * .01))
+        rec_sink.put(MSPDataFrame(topic=MSPControlMessage.ControlTopic(), data=MSPControlMessage.END_OF_STREAM))
+        rec_sink.start()
+        rec_sink.join()
+
+        clock = PlaybackClock(playback_speed=1.)
+        clock.seek(.1)  # frames before are skipped
+        sources = [DefaultReplaySource(file_path=self.filename, clock=clock) for _ in range(2)]
+        sink = ListSink()
+        pipeline = GraphPipeline()
+        pipeline.add(sources + [sink])
+        for source in sources:
+            pipeline.connect(source, sink)
+
+        t_start = perf_counter()
+        pipeline.start()
+        sleep(.05)
+        clock.pause()
+        sleep(.1)
+        clock.resume()
+        pipeline.join()
+
+        self.assertAlmostEqual(.29, perf_counter() - t_start, delta=.03)
+        # both sources play the frames in sync
+        self.assertEqual(sorted([i * .01 for i in range(10, 30)] * 2), [f.timestamp for f in sink.list])
 
     # Cleanup
     def tearDown(self) -> None:
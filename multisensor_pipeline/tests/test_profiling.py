@@ -1,3 +1,4 @@
+import pickle
 import time
 import unittest
 from random import randint
@@ -93,6 +94,20 @@ class ProfilingTest(unittest.TestCase):
               f"measured = {stats[topic.uuid].samplerate:.3f} Hz")
         self.assertAlmostEqual(actual_rate, stats[topic.uuid].samplerate, delta=DELTA)
 
+    def test_update_time_and_snapshot(self):
+        msp_stats = MSPModuleStats()
+        msp_stats.add_update_time(.01)
+        msp_stats.add_update_time(.04, frames=4)  # a batch of 4 frames
+        self.assertAlmostEqual(.01, msp_stats.average_update_time)
+
+        topic = Topic(name="random", dtype=int)
+        msp_stats.add_frame(MSPDataFrame(topic=topic, data=1), direction=MSPModuleStats.Direction.IN)
+        snapshot = pickle.loads(pickle.dumps(msp_stats.snapshot()))
+        msp_stats.add_frame(MSPDataFrame(topic=Topic(name="other", dtype=int), data=1),
+                            direction=MSPModuleStats.Direction.IN)
+        self.assertEqual([topic.uuid], list(snapshot.get_stats(MSPModuleStats.Direction.IN).keys()))
+        self.assertAlmostEqual(.01, snapshot.average_update_time)
+
     def test_simple_profiling(self):
         topic = Topic(name="random", dtype=np.ndarray)
         frequency = self._test_frequency
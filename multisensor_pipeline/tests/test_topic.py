@@ -3,7 +3,8 @@ from time import sleep
 from typing import Optional, List
 from multisensor_pipeline import BaseSource, BaseSink
 from multisensor_pipeline.modules.base.sampling import BaseDiscreteSamplingSource
-from multisensor_pipeline.dataframe import MSPDataFrame, Topic
+from multisensor_pipeline.dataframe import MSPDataFrame, Topic, MSPControlMessage, topic_registry
+from multisensor_pipeline.dataframe.registry import topics_match
 from multisensor_pipeline.pipeline.graph import GraphPipeline
 
 SLEEPTIME = 1.
@@ -127,6 +128,37 @@ class TopicTest(unittest.TestCase):
         # name makes a difference, if defined for both
         self.assertNotEqual(t_int_n, t_int_n_rand)
 
+    def test_topic_identity(self):
+        import pickle
+        topic = Topic(name="int", dtype=int)
+        self.assertEqual("int:<class 'int'>", topic.uuid)
+        self.assertEqual(hash(Topic(name="int", dtype=int)), hash(topic))
+        self.assertFalse(topic.is_control_topic)
+        self.assertTrue(MSPControlMessage.ControlTopic().is_control_topic)
+
+        unpickled = pickle.loads(pickle.dumps(topic))
+        self.assertEqual(topic.uuid, unpickled.uuid)
+        self.assertEqual(hash(topic), hash(unpickled))
+        control_message = pickle.loads(pickle.dumps(MSPControlMessage(MSPControlMessage.END_OF_STREAM)))
+        self.assertTrue(control_message.topic.is_control_topic)
+
+    def test_topic_registry(self):
+        t_int = Topic(dtype=int)
+        t_int_n = Topic(name="int", dtype=int)
+        t_int_n_rand = Topic(name="random", dtype=int)
+
+        # equal topics are interned to the same id
+        self.assertEqual(t_int_n.id, Topic(name="int", dtype=int).id)
+        self.assertNotEqual(t_int.id, t_int_n.id)
+        self.assertEqual(t_int_n.uuid, topic_registry.get_topic(t_int_n.id).uuid)
+
+        # the precomputed matches are equivalent to the topic comparison
+        for producer in [Topic(), t_int, t_int_n, t_int_n_rand, Topic(name="bool", dtype=bool)]:
+            for consumer in [Topic(), t_int, t_int_n, t_int_n_rand, Topic(name="bool", dtype=bool)]:
+                self.assertEqual(topics_match(producer, consumer), topic_registry.matches(producer.id, consumer.id))
+        self.assertTrue(topic_registry.matches(t_int_n.id, t_int.id))
+        self.assertFalse(topic_registry.matches(t_int.id, t_int_n.id))
+
     def test_any_any_topic(self):
         source = AnySource()
         sink = AnySink()